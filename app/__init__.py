@@ -11,6 +11,17 @@ from .config import (
     MAIL_USE_TLS,
     MAIL_USERNAME,
     MAIL_PASSWORD,
+    PROFILE_DIR,
+    PROFILE_HEADER,
+    PROFILE_SAMPLE_RATE,
+    PROFILE_SAMPLE_INTERVAL,
+    SLOW_REQUEST_MS,
+    INTRADAY_MINUTE_RETENTION_DAYS,
+    INTRADAY_HOUR_RETENTION_DAYS,
+    ADMISSION_LIMITS,
+    ADMISSION_QUEUE_DEPTH,
+    ADMISSION_QUEUE_TIMEOUT,
+    ADMISSION_USER_INFLIGHT,
 )
 
 # Initialize global extensions
@@ -35,10 +46,33 @@ def create_app():
     app.config["MAIL_USERNAME"] = MAIL_USERNAME
     app.config["MAIL_PASSWORD"] = MAIL_PASSWORD
 
+    # --- Profiling Config ---
+    app.config["PROFILE_DIR"] = PROFILE_DIR
+    app.config["PROFILE_HEADER"] = PROFILE_HEADER
+    app.config["PROFILE_SAMPLE_RATE"] = PROFILE_SAMPLE_RATE
+    app.config["PROFILE_SAMPLE_INTERVAL"] = PROFILE_SAMPLE_INTERVAL
+    app.config["SLOW_REQUEST_MS"] = SLOW_REQUEST_MS
+
+    # --- Intraday Series Retention ---
+    app.config["INTRADAY_MINUTE_RETENTION_DAYS"] = INTRADAY_MINUTE_RETENTION_DAYS
+    app.config["INTRADAY_HOUR_RETENTION_DAYS"] = INTRADAY_HOUR_RETENTION_DAYS
+
+    # --- Admission Control ---
+    app.config["ADMISSION_LIMITS"] = ADMISSION_LIMITS
+    app.config["ADMISSION_QUEUE_DEPTH"] = ADMISSION_QUEUE_DEPTH
+    app.config["ADMISSION_QUEUE_TIMEOUT"] = ADMISSION_QUEUE_TIMEOUT
+    app.config["ADMISSION_USER_INFLIGHT"] = ADMISSION_USER_INFLIGHT
+
     # --- Initialize Extensions ---
     db.init_app(app)
     mail.init_app(app)
 
+    from .profiling import init_profiling
+    init_profiling(app)
+
+    from .admission import init_admission
+    init_admission(app)
+
     # --- Register Blueprints ---
     from .routes.auth import auth_bp
     app.register_blueprint(auth_bp)
@@ -55,6 +89,16 @@ def create_app():
     from .routes.stocks import stocks_bp
     app.register_blueprint(stocks_bp)
 
+    from .routes.analytics import analytics_bp
+    app.register_blueprint(analytics_bp)
+
+    from .routes.rebalance import rebalance_bp
+    app.register_blueprint(rebalance_bp)
+
+    # --- CLI Batch Jobs ---
+    from .commands import register_commands
+    register_commands(app)
+
    
 
     return app
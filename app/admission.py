@@ -0,0 +1,164 @@
+# app/admission.py
+from flask import g, request, session, Response
+from threading import Condition, Lock
+import math
+import time
+
+
+# ---------------- Gates ----------------
+class Gate:
+    """
+    Concurrency limit for one endpoint with a short bounded wait queue.
+    Requests over `capacity` wait up to `timeout` seconds for a slot; once
+    `queue_depth` requests are already waiting, new ones are rejected at once.
+    """
+
+    def __init__(self, name, capacity, queue_depth, timeout):
+        self.name = name
+        self.capacity = capacity
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self._cond = Condition()
+        self._service_s = 1.0   # moving average of request time, for Retry-After
+        self.stats = {"admitted": 0, "queued": 0, "rejected_full": 0,
+                      "rejected_timeout": 0, "max_waiting": 0, "wait_ms": 0.0}
+
+    def acquire(self):
+        """True once a slot is held; False if the queue is full or the wait timed out."""
+        with self._cond:
+            if self.active < self.capacity and self.waiting == 0:
+                self.active += 1
+                self.stats["admitted"] += 1
+                return True
+            if self.waiting >= self.queue_depth:
+                self.stats["rejected_full"] += 1
+                return False
+
+            self.waiting += 1
+            self.stats["queued"] += 1
+            self.stats["max_waiting"] = max(self.stats["max_waiting"], self.waiting)
+            start = time.perf_counter()
+            admitted = self._cond.wait_for(lambda: self.active < self.capacity, timeout=self.timeout)
+            self.waiting -= 1
+            self.stats["wait_ms"] += (time.perf_counter() - start) * 1000
+            if not admitted:
+                self.stats["rejected_timeout"] += 1
+                return False
+            self.active += 1
+            self.stats["admitted"] += 1
+            return True
+
+    def release(self, elapsed):
+        with self._cond:
+            self.active -= 1
+            self._service_s = 0.8 * self._service_s + 0.2 * elapsed
+            self._cond.notify_all()
+
+    def retry_after(self):
+        """Seconds until the backlog ahead of a new request should have drained."""
+        with self._cond:
+            backlog = self.active + self.waiting + 1
+            return max(1, math.ceil(self._service_s * backlog / self.capacity))
+
+    def snapshot(self):
+        with self._cond:
+            return dict(self.stats, endpoint=self.name, capacity=self.capacity,
+                        queue_depth=self.queue_depth, active=self.active, waiting=self.waiting,
+                        avg_service_ms=round(self._service_s * 1000, 1),
+                        wait_ms=round(self.stats["wait_ms"], 1))
+
+
+class UserLimiter:
+    """Caps how many limited requests a single user may have in flight."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = {}
+        self.rejected = 0
+        self._lock = Lock()
+
+    def acquire(self, user_id):
+        with self._lock:
+            if self.in_flight.get(user_id, 0) >= self.limit:
+                self.rejected += 1
+                return False
+            self.in_flight[user_id] = self.in_flight.get(user_id, 0) + 1
+            return True
+
+    def release(self, user_id):
+        with self._lock:
+            remaining = self.in_flight.get(user_id, 0) - 1
+            if remaining > 0:
+                self.in_flight[user_id] = remaining
+            else:
+                self.in_flight.pop(user_id, None)
+
+    def snapshot(self):
+        with self._lock:
+            return {"limit": self.limit, "users_in_flight": len(self.in_flight),
+                    "requests_in_flight": sum(self.in_flight.values()), "rejected": self.rejected}
+
+
+_gates = {}
+_users = None
+
+
+def admission_stats():
+    """Per-endpoint queue depth and rejection counters for this worker process."""
+    return {
+        "gates": [gate.snapshot() for gate in _gates.values()],
+        "users": _users.snapshot() if _users else None,
+    }
+
+
+def _reject(status, retry_after, message):
+    response = Response(message, status=status, mimetype="text/plain")
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+
+# ---------------- Request Hooks ----------------
+def init_admission(app):
+    """
+    Limit concurrency on the endpoints listed in ADMISSION_LIMITS and cap each
+    user's in-flight requests to them. Cheap routes such as /login are never
+    gated, so they keep their workers when expensive pages pile up.
+    Limits are per worker process.
+    """
+    global _users
+    for endpoint, capacity in app.config["ADMISSION_LIMITS"].items():
+        _gates[endpoint] = Gate(endpoint, capacity,
+                                app.config["ADMISSION_QUEUE_DEPTH"],
+                                app.config["ADMISSION_QUEUE_TIMEOUT"])
+    _users = UserLimiter(app.config["ADMISSION_USER_INFLIGHT"])
+
+    @app.before_request
+    def _admit_request():
+        gate = _gates.get(request.endpoint)
+        if gate is None:
+            return None
+
+        user_id = session.get("user_id")
+        if user_id is not None and not _users.acquire(user_id):
+            return _reject(429, 1, "Too many requests in progress for this account. Please retry shortly.")
+
+        if not gate.acquire():
+            if user_id is not None:
+                _users.release(user_id)
+            return _reject(503, gate.retry_after(), "This page is busy right now. Please retry shortly.")
+
+        g.admission = (gate, user_id, time.perf_counter())
+        return None
+
+    @app.teardown_request
+    def _release_request(exc):
+        # Teardown runs even when the view raised, so slots are never leaked
+        admitted = g.pop("admission", None)
+        if admitted is None:
+            return
+        gate, user_id, start = admitted
+        gate.release(time.perf_counter() - start)
+        if user_id is not None:
+            _users.release(user_id)
@@ -0,0 +1,198 @@
+# app/backtest.py
+from app import db
+from app.models import User, Holding, Threshold, BacktestResult
+from app.market_data import load_price_matrix
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from sqlalchemy import func
+import numpy as np
+
+# Order matters: rows of the simulated value matrix follow this tuple
+STRATEGIES = ("buy_and_hold", "hold_cash", "switch_safe", "switch_best")
+STRENGTH_WINDOW = 14        # matches compute_trend_strength() in routes/nav.py
+DEFAULT_SAFE_ASSET = "SPY"
+
+
+# ---------------- Simulation ----------------
+def trailing_strength(prices, window=STRENGTH_WINDOW):
+    """Rolling mean of daily returns for every column, as a (days x tickers) array."""
+    returns = np.zeros_like(prices)
+    returns[1:] = prices[1:] / prices[:-1] - 1.0
+    csum = np.cumsum(returns, axis=0)
+    lagged = np.zeros_like(csum)
+    lagged[window:] = csum[:-window]
+    counts = np.minimum(np.arange(1, len(prices) + 1), window)[:, None]
+    return (csum - lagged) / counts
+
+
+def simulate_strategies(prices, quantities, thresholds, safe_prices=None):
+    """
+    Replay every fallback strategy over the same price history at once.
+    - prices: (days x holdings) closes
+    - quantities: share count per holding
+    - thresholds: min_price per holding (NaN where no threshold is set)
+    - safe_prices: closes of the user's safe asset, or None to fall back to cash
+    Once a holding closes below its threshold it is sold at that close and the
+    proceeds follow the strategy, like handle_breakdown() does live.
+    Returns a (strategies x days) array of portfolio values.
+    """
+    days, n = prices.shape
+    cols = np.arange(n)
+    if safe_prices is None:
+        safe_prices = np.ones(days)
+
+    with np.errstate(invalid="ignore"):
+        breach = prices < thresholds            # NaN thresholds never breach
+    broken = np.logical_or.accumulate(breach, axis=0)
+    t_break = np.argmax(breach, axis=0)         # first breach day per holding
+    proceeds = quantities * prices[t_break, cols]
+
+    # switch_best: strongest holding that is still intact on the breach day
+    strength = trailing_strength(prices)
+    candidates = np.where(broken[t_break], -np.inf, strength[t_break])
+    candidates[cols, cols] = -np.inf
+    best = np.argmax(candidates, axis=1)
+    no_best = ~np.isfinite(candidates[cols, best])
+
+    # Price path each sold holding's proceeds follow after the breach, per strategy
+    targets = np.empty((len(STRATEGIES), days, n))
+    targets[0] = prices
+    targets[1] = 1.0
+    targets[2] = safe_prices[:, None]
+    targets[3] = np.where(no_best, safe_prices[:, None], prices[:, best])
+
+    units = np.empty((len(STRATEGIES), n))
+    units[0] = quantities
+    units[1:] = proceeds / targets[1:, t_break, cols]
+
+    switched = np.broadcast_to(broken, targets.shape).copy()
+    switched[0] = False                         # buy-and-hold ignores thresholds
+
+    values = np.where(switched, units[:, None, :] * targets, (quantities * prices)[None])
+    return values.sum(axis=2)
+
+
+def summarize(values):
+    """Total return and max drawdown for every row of a strategy value matrix."""
+    start = values[:, :1]
+    total_return = values[:, -1] / start[:, 0] - 1.0
+    drawdown = values / np.maximum.accumulate(values, axis=1) - 1.0
+    return [{
+        "strategy": name,
+        "total_return": float(total_return[i]),
+        "max_drawdown": float(drawdown[i].min()),
+        "final_value": float(values[i, -1]),
+    } for i, name in enumerate(STRATEGIES)]
+
+
+def _backtest_job(payload):
+    """Process-pool entry point; takes and returns plain picklable data only."""
+    user_id, prices, quantities, thresholds, safe_prices = payload
+    return user_id, summarize(simulate_strategies(prices, quantities, thresholds, safe_prices))
+
+
+# ---------------- Data Loading ----------------
+def _user_payloads(users, period="1y"):
+    """
+    Build simulation inputs for many users from one batched price download.
+    Yields (user_id, prices, quantities, thresholds, safe_prices) tuples.
+    """
+    user_ids = [u.id for u in users]
+    holdings = Holding.query.filter(Holding.user_id.in_(user_ids)).all()
+    thresholds = Threshold.query.filter(Threshold.user_id.in_(user_ids)).all()
+
+    positions = {}
+    for h in holdings:
+        pos = positions.setdefault(h.user_id, {})
+        pos[h.ticker.upper()] = pos.get(h.ticker.upper(), 0) + h.quantity
+    if not positions:
+        # Nothing to replay, so don't download the safe assets either
+        return
+    limits = {(t.user_id, t.ticker.upper()): float(t.min_price)
+              for t in thresholds if t.min_price is not None and t.alert_enabled}
+    safe_assets = {u.id: (u.fallback_asset or DEFAULT_SAFE_ASSET).upper() for u in users if u.id in positions}
+
+    universe = set(safe_assets.values())
+    for pos in positions.values():
+        universe.update(pos)
+    _, tickers, prices = load_price_matrix(universe, period=period)
+    if len(tickers) == 0 or len(prices) < 2:
+        return
+    column = {t: i for i, t in enumerate(tickers)}
+
+    for user_id, pos in positions.items():
+        held = [t for t, q in pos.items() if q > 0 and t in column]
+        if not held:
+            continue
+        idx = [column[t] for t in held]
+        safe = safe_assets.get(user_id)
+        yield (
+            user_id,
+            prices[:, idx],
+            np.array([pos[t] for t in held], dtype=float),
+            np.array([limits.get((user_id, t), np.nan) for t in held]),
+            prices[:, column[safe]] if safe in column else None,
+        )
+
+
+def _store_results(results, run_date):
+    """Replace the given users' results for `run_date` with a bulk insert."""
+    if not results:
+        return
+    BacktestResult.query.filter(
+        BacktestResult.run_date == run_date,
+        BacktestResult.user_id.in_([user_id for user_id, _ in results]),
+    ).delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(BacktestResult, [
+        dict(user_id=user_id, run_date=run_date, **row)
+        for user_id, rows in results for row in rows
+    ])
+    db.session.commit()
+
+
+# ---------------- Entry Points ----------------
+def backtest_user(user, period="1y"):
+    """Backtest a single user in-process and store today's results."""
+    results = [_backtest_job(p) for p in _user_payloads([user], period)]
+    _store_results(results, date.today())
+    return results[0][1] if results else []
+
+
+def backtest_all_users(period="1y", workers=None, batch_size=500):
+    """
+    Nightly batch: backtest every user with holdings.
+    Prices are downloaded once per batch of users and the simulations are
+    spread over a process pool.
+    """
+    run_date = date.today()
+    total = 0
+    user_ids = [row.user_id for row in db.session.query(Holding.user_id).distinct()]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(user_ids), batch_size):
+            users = User.query.filter(User.id.in_(user_ids[start:start + batch_size])).all()
+            payloads = list(_user_payloads(users, period))
+            results = list(pool.map(_backtest_job, payloads, chunksize=16))
+            _store_results(results, run_date)
+            total += len(results)
+    return total
+
+
+def latest_results(user):
+    """
+    The user's most recent stored backtest rows, or [] before the first
+    nightly run. Never computes on the request; backtest_all_users does that.
+    """
+    run_date = (db.session.query(func.max(BacktestResult.run_date))
+                .filter(BacktestResult.user_id == user.id)
+                .scalar())
+    if run_date is None:
+        return []
+    rows = BacktestResult.query.filter_by(user_id=user.id, run_date=run_date).all()
+    order = {name: i for i, name in enumerate(STRATEGIES)}
+    return sorted(({
+        "strategy": r.strategy,
+        "total_return": r.total_return,
+        "max_drawdown": r.max_drawdown,
+        "final_value": float(r.final_value),
+    } for r in rows), key=lambda r: order.get(r["strategy"], len(order)))
@@ -0,0 +1,75 @@
+# app/cache.py
+from threading import Lock
+from datetime import date
+from app.market_hours import previous_trading_day
+import time
+
+
+def trading_day(today=None):
+    """Return the most recent exchange trading day, used as the key for once-a-day caches."""
+    return previous_trading_day(today or date.today())
+
+
+class DailyCache:
+    """
+    Process-local cache whose entries expire when the trading day rolls over.
+    Safe to share between request threads.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._day = None
+        self._data = {}
+        self._lock = Lock()
+
+    def _roll(self):
+        today = trading_day()
+        if self._day != today:
+            self._day = today
+            self._data.clear()
+
+    def get(self, key):
+        with self._lock:
+            self._roll()
+            return self._data.get(key)
+
+    def set(self, key, value):
+        with self._lock:
+            self._roll()
+            if len(self._data) >= self.maxsize:
+                # Drop the oldest entry (dicts keep insertion order)
+                self._data.pop(next(iter(self._data)))
+            self._data[key] = value
+        return value
+
+
+class TTLCache:
+    """
+    Process-local cache where every entry carries its own time-to-live, so
+    callers can pick a short or long expiry from the market-hours policy.
+    Safe to share between request threads.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._data = {}
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            if key not in self._data and len(self._data) >= self.maxsize:
+                # Drop the oldest entry (dicts keep insertion order)
+                self._data.pop(next(iter(self._data)))
+            self._data[key] = (time.monotonic() + ttl, value)
+        return value
@@ -0,0 +1,115 @@
+# app/commands.py
+import click
+
+
+def register_commands(app):
+    """Attach batch jobs to the `flask` CLI (run them from cron or a worker)."""
+
+    @app.cli.command("backtest-all")
+    @click.option("--period", default="1y", help="History window to replay.")
+    @click.option("--workers", default=None, type=int, help="Process pool size.")
+    def backtest_all_command(period, workers):
+        """Backtest fallback strategies for every user."""
+        from app.backtest import backtest_all_users
+        count = backtest_all_users(period=period, workers=workers)
+        click.echo(f"Backtested {count} users")
+
+    @app.cli.command("precompute-suggestions")
+    def precompute_suggestions_command():
+        """Compute today's threshold suggestions for every tracked ticker."""
+        from app.routes.nav import precompute_threshold_suggestions
+        count = precompute_threshold_suggestions()
+        click.echo(f"Stored {count} threshold suggestions")
+
+    @app.cli.command("compact-ledger")
+    def compact_ledger_command():
+        """Write position snapshots for users with new trades."""
+        from app.ledger import compact_all_snapshots
+        count = compact_all_snapshots()
+        click.echo(f"Snapshotted {count} users")
+
+    @app.cli.command("universe-load")
+    @click.argument("path", required=False)
+    def universe_load_command(path):
+        """Load the screener universe from a CSV (defaults to the built-in list)."""
+        from app.screener import load_universe, load_universe_csv
+        from app.routes.stocks import TOP_STOCKS
+        count = load_universe_csv(path) if path else load_universe(TOP_STOCKS)
+        click.echo(f"Loaded {count} securities")
+
+    @app.cli.command("universe-refresh")
+    def universe_refresh_command():
+        """Recompute screener prices and momentum in batches."""
+        from app.screener import refresh_universe_metrics
+        count = refresh_universe_metrics()
+        click.echo(f"Refreshed {count} securities")
+
+    @app.cli.command("intraday-retention")
+    def intraday_retention_command():
+        """Drop minute/hour portfolio values past their retention window."""
+        from app.intraday import apply_retention
+        count = apply_retention()
+        click.echo(f"Deleted {count} intraday points")
+
+    @app.cli.command("recommend-precompute")
+    def recommend_precompute_command():
+        """Build today's universe return-correlation factor for recommendations."""
+        from app.models import Security
+        from app.recommend import precompute_return_factor
+        tickers = [t for (t,) in Security.query.with_entities(Security.ticker)]
+        count = precompute_return_factor(tickers)
+        click.echo(f"Correlation factor built for {count} tickers")
+
+    @app.cli.command("news-refresh")
+    def news_refresh_command():
+        """Pull market and tracked-ticker news into the local archive."""
+        from app.news_archive import refresh_archive
+        count = refresh_archive()
+        click.echo(f"Archived {count} new articles")
+
+    @app.cli.command("securities-refresh")
+    @click.option("--limit", default=200, help="Securities to refresh in this run.")
+    def securities_refresh_command(limit):
+        """Fill in or refresh reference data for the stalest securities."""
+        from app.securities import refresh_security_metadata
+        count = refresh_security_metadata(limit=limit)
+        click.echo(f"Refreshed metadata for {count} securities")
+
+    @app.cli.command("rebalance-all")
+    @click.option("--batch-size", default=1000, help="Users solved per matrix.")
+    def rebalance_all_command(batch_size):
+        """Plan rebalancing orders for every user with target allocations."""
+        from app.rebalance import rebalance_all_users
+        count = rebalance_all_users(batch_size=batch_size)
+        click.echo(f"Planned rebalancing for {count} users")
+
+    @app.cli.command("valuations-rebuild")
+    @click.option("--batch-size", default=1000, help="Users recomputed per query.")
+    def valuations_rebuild_command(batch_size):
+        """Recompute every materialized portfolio valuation from holdings."""
+        from app.valuation import rebuild_all_valuations
+        count = rebuild_all_valuations(batch_size=batch_size)
+        click.echo(f"Rebuilt valuations for {count} users")
+
+    @app.cli.command("db-indexes")
+    def db_indexes_command():
+        """Create model indexes missing from tables made before they were declared."""
+        from app.schema import create_missing_indexes
+        created = create_missing_indexes()
+        click.echo(f"Created {len(created)} indexes" + (f": {', '.join(created)}" if created else ""))
+
+    @app.cli.command("scheduler")
+    @click.option("--once", is_flag=True, help="Run a single tick and exit.")
+    @click.option("--eod", is_flag=True, help="Run the end-of-day jobs for the last close and exit.")
+    def scheduler_command(once, eod):
+        """Market-hours aware loop: polls prices in session and runs EOD jobs after the close."""
+        from app.scheduler import MarketScheduler
+        from app.market_hours import last_close
+        scheduler = MarketScheduler(app)
+        if eod:
+            for name, result in scheduler.run_eod(last_close().date()).items():
+                click.echo(f"{name}: {result}")
+        elif once:
+            click.echo(f"Next tick in {scheduler.tick():.0f}s")
+        else:
+            scheduler.run_forever()
@@ -7,4 +7,34 @@ MAIL_PORT = 587
 MAIL_USE_TLS = True
 MAIL_USERNAME = "add_your_own_mailid"
 MAIL_PASSWORD = "add_your_own_app_password"
-MAIL_DEFAULT_SENDER = MAIL_USERNAME
\ No newline at end of file
+MAIL_DEFAULT_SENDER = MAIL_USERNAME
+
+NEWS_API_KEY = "e6fcbb7c9f3740c5b3d2ae7e4386a729"  # replace with your API key
+
+# --- Request profiling ---
+PROFILE_DIR = "profiles"            # where .prof / .folded / .json profiles are written
+PROFILE_HEADER = "X-Profile"        # admins send "cprofile" or "sample" to profile a request
+PROFILE_SAMPLE_RATE = 0.0           # fraction of all requests profiled with the stack sampler
+PROFILE_SAMPLE_INTERVAL = 0.005     # seconds between stack samples
+SLOW_REQUEST_MS = 2000              # requests slower than this are logged
+
+# --- Intraday portfolio value retention (days); daily points are kept forever ---
+INTRADAY_MINUTE_RETENTION_DAYS = 7
+INTRADAY_HOUR_RETENTION_DAYS = 180
+
+# --- Admission control (per worker process) ---
+ADMISSION_LIMITS = {                # endpoint -> requests served at once
+    "stocks.top_stocks": 4,
+    "profile.profile": 6,
+    "analytics.analytics": 3,
+    "rebalance.rebalance": 3,
+    "rebalance.apply": 2,
+    "threshold.thresholds": 4,
+    "news.news": 4,
+    "profile.import_holdings": 2,
+    "profile.export_holdings": 2,
+    "profile.export_history": 2,
+}
+ADMISSION_QUEUE_DEPTH = 8           # requests allowed to wait per endpoint before fast rejection
+ADMISSION_QUEUE_TIMEOUT = 3.0       # seconds a queued request waits for a slot
+ADMISSION_USER_INFLIGHT = 2         # limited requests one user may have in flight
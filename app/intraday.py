@@ -0,0 +1,91 @@
+# app/intraday.py
+from flask import current_app
+from app import db
+from app.models import PortfolioValuePoint
+from app.upserts import upsert
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# Finest to coarsest; every recorded value lands in one bucket of each tier
+TIERS = (
+    ("minute", timedelta(minutes=1)),
+    ("hour", timedelta(hours=1)),
+    ("day", timedelta(days=1)),
+)
+MAX_CHART_POINTS = 1500     # enough for one full day of minute points
+
+
+def bucket_start(at, tier):
+    """Truncate a timestamp to the start of its bucket in `tier`."""
+    if tier == "minute":
+        return at.replace(second=0, microsecond=0)
+    if tier == "hour":
+        return at.replace(minute=0, second=0, microsecond=0)
+    return at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def retention(tier):
+    """How long rows of `tier` are kept, or None for forever."""
+    if tier == "minute":
+        return timedelta(days=current_app.config["INTRADAY_MINUTE_RETENTION_DAYS"])
+    if tier == "hour":
+        return timedelta(days=current_app.config["INTRADAY_HOUR_RETENTION_DAYS"])
+    return None
+
+
+def record_value(user_id, value, at=None):
+    """
+    Record a portfolio valuation (caller commits). The minute bucket and its
+    enclosing hour and day buckets are rolled up with one upsert (last / low /
+    high), so concurrent writers of the same bucket merge instead of failing.
+    """
+    at = at or datetime.utcnow()
+    value = Decimal(value).quantize(Decimal("0.01"))
+    upsert(PortfolioValuePoint, [
+        {"user_id": user_id, "tier": tier, "bucket_start": bucket_start(at, tier),
+         "value": value, "low": value, "high": value}
+        for tier, _ in TIERS
+    ], keys=["user_id", "tier", "bucket_start"], replace=["value"], low=["low"], high=["high"])
+
+
+def apply_retention(now=None):
+    """Drop fine-grained rows older than their tier's retention. Returns rows deleted."""
+    now = now or datetime.utcnow()
+    deleted = 0
+    for tier, _ in TIERS:
+        keep = retention(tier)
+        if keep is None:
+            continue
+        deleted += (PortfolioValuePoint.query
+                    .filter(PortfolioValuePoint.tier == tier,
+                            PortfolioValuePoint.bucket_start < now - keep)
+                    .delete(synchronize_session=False))
+    db.session.commit()
+    return deleted
+
+
+def choose_tier(start, end, now=None, max_points=MAX_CHART_POINTS):
+    """Finest tier that still covers `start` and keeps the chart under `max_points`."""
+    now = now or datetime.utcnow()
+    for tier, width in TIERS:
+        keep = retention(tier)
+        if keep is not None and start < now - keep:
+            continue
+        if (end - start) / width <= max_points:
+            return tier
+    return TIERS[-1][0]
+
+
+def value_series(user_id, start, end=None, max_points=MAX_CHART_POINTS):
+    """Chart points between `start` and `end` from the appropriate tier."""
+    end = end or datetime.utcnow()
+    tier = choose_tier(start, end, max_points=max_points)
+    rows = (db.session.query(PortfolioValuePoint.bucket_start, PortfolioValuePoint.value,
+                             PortfolioValuePoint.low, PortfolioValuePoint.high)
+            .filter(PortfolioValuePoint.user_id == user_id,
+                    PortfolioValuePoint.tier == tier,
+                    PortfolioValuePoint.bucket_start >= bucket_start(start, tier),
+                    PortfolioValuePoint.bucket_start <= end)
+            .order_by(PortfolioValuePoint.bucket_start)
+            .all())
+    return tier, rows
@@ -0,0 +1,161 @@
+# app/ledger.py
+from app import db
+from app.models import Trade, PositionSnapshot, Holding
+from decimal import Decimal
+from datetime import datetime
+from sqlalchemy import func
+
+# A new snapshot is written once this many trades pile up after the last one,
+# so rebuilding any point in time replays at most this many ledger rows.
+SNAPSHOT_EVERY = 50
+
+
+# ---------------- Replay Helpers ----------------
+def apply_trades(positions, trades):
+    """
+    Apply trades in ledger order to {ticker: [quantity, avg_price]}.
+    Buys update the average cost, sells only reduce quantity.
+    """
+    for t in trades:
+        qty, avg = positions.get(t.ticker, [0, Decimal("0.00")])
+        if t.side == "buy":
+            new_qty = qty + t.quantity
+            avg = (avg * qty + Decimal(t.price) * t.quantity) / new_qty
+            qty = new_qty
+        else:
+            qty -= t.quantity
+        if qty > 0:
+            positions[t.ticker] = [qty, avg]
+        else:
+            positions.pop(t.ticker, None)
+    return positions
+
+
+def _load_positions(snapshot):
+    if snapshot is None:
+        return {}
+    return {t: [int(q), Decimal(p)] for t, (q, p) in snapshot.positions.items()}
+
+
+def _dump_positions(positions):
+    return {t: [q, str(Decimal(p).quantize(Decimal("0.0001")))] for t, (q, p) in positions.items()}
+
+
+def latest_snapshot(user_id, when=None):
+    """Newest snapshot taken at or before `when` (uses the user/taken_at index)."""
+    query = PositionSnapshot.query.filter_by(user_id=user_id)
+    if when is not None:
+        query = query.filter(PositionSnapshot.taken_at <= when)
+    return query.order_by(PositionSnapshot.taken_at.desc(), PositionSnapshot.snapshot_id.desc()).first()
+
+
+# ---------------- Public API ----------------
+def _ensure_opening_snapshot(user_id):
+    """Capture pre-ledger holdings the first time a user trades."""
+    if latest_snapshot(user_id) is not None:
+        return
+    opening = {h.ticker: [h.quantity, Decimal(h.purchase_price)]
+               for h in Holding.query.filter_by(user_id=user_id) if h.quantity > 0}
+    last_id = db.session.query(func.max(Trade.trade_id)).filter_by(user_id=user_id).scalar() or 0
+    db.session.add(PositionSnapshot(user_id=user_id, last_trade_id=last_id,
+                                    positions=_dump_positions(opening)))
+
+
+def record_trade(user_id, ticker, side, quantity, price, executed_at=None):
+    """
+    Append a trade to the ledger (the caller commits).
+    Must run before the Holding row is changed so the opening snapshot
+    reflects the position the trade starts from.
+    """
+    _ensure_opening_snapshot(user_id)
+    trade = Trade(
+        user_id=user_id,
+        ticker=ticker.upper(),
+        side=side,
+        quantity=quantity,
+        price=price,
+        executed_at=executed_at or datetime.utcnow(),
+    )
+    db.session.add(trade)
+    return trade
+
+
+def record_trades(user_id, trades):
+    """Bulk version of record_trade() for (ticker, side, quantity, price) tuples."""
+    _ensure_opening_snapshot(user_id)
+    now = datetime.utcnow()
+    db.session.bulk_insert_mappings(Trade, [
+        {"user_id": user_id, "ticker": ticker.upper(), "side": side,
+         "quantity": quantity, "price": price, "executed_at": now}
+        for ticker, side, quantity, price in trades
+    ])
+
+
+def positions_at(user_id, when=None):
+    """
+    Rebuild a user's positions as of `when` (default: now) from the nearest
+    snapshot plus the short tail of trades recorded after it.
+    Returns {ticker: {"quantity": int, "avg_price": Decimal}}.
+    """
+    when = when or datetime.utcnow()
+    snapshot = latest_snapshot(user_id, when)
+    tail = (Trade.query
+            .filter(Trade.user_id == user_id,
+                    Trade.trade_id > (snapshot.last_trade_id if snapshot else 0),
+                    Trade.executed_at <= when)
+            .order_by(Trade.trade_id)
+            .all())
+    positions = apply_trades(_load_positions(snapshot), tail)
+    return {t: {"quantity": q, "avg_price": p.quantize(Decimal("0.01"))}
+            for t, (q, p) in sorted(positions.items())}
+
+
+def take_snapshot(user_id):
+    """Compact everything up to the user's newest trade into a snapshot (caller commits)."""
+    snapshot = latest_snapshot(user_id)
+    tail = (Trade.query
+            .filter(Trade.user_id == user_id,
+                    Trade.trade_id > (snapshot.last_trade_id if snapshot else 0))
+            .order_by(Trade.trade_id)
+            .all())
+    if snapshot is not None and not tail:
+        return snapshot
+
+    positions = apply_trades(_load_positions(snapshot), tail)
+    new_snapshot = PositionSnapshot(
+        user_id=user_id,
+        last_trade_id=tail[-1].trade_id if tail else 0,
+        positions=_dump_positions(positions),
+    )
+    db.session.add(new_snapshot)
+    return new_snapshot
+
+
+def maybe_snapshot(user_id):
+    """Snapshot the user once SNAPSHOT_EVERY trades have accumulated since the last one."""
+    snapshot = latest_snapshot(user_id)
+    pending = (db.session.query(func.count(Trade.trade_id))
+               .filter(Trade.user_id == user_id,
+                       Trade.trade_id > (snapshot.last_trade_id if snapshot else 0))
+               .scalar())
+    if pending >= SNAPSHOT_EVERY:
+        take_snapshot(user_id)
+        db.session.commit()
+
+
+def compact_all_snapshots():
+    """Nightly job: snapshot every user with trades newer than their last snapshot."""
+    last_snap = (db.session.query(PositionSnapshot.user_id,
+                                  func.max(PositionSnapshot.last_trade_id).label("last_id"))
+                 .group_by(PositionSnapshot.user_id)
+                 .subquery())
+    user_ids = [row.user_id for row in (
+        db.session.query(Trade.user_id)
+        .outerjoin(last_snap, last_snap.c.user_id == Trade.user_id)
+        .group_by(Trade.user_id, last_snap.c.last_id)
+        .having(func.max(Trade.trade_id) > func.coalesce(last_snap.c.last_id, 0))
+    )]
+    for user_id in user_ids:
+        take_snapshot(user_id)
+    db.session.commit()
+    return len(user_ids)
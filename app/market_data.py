@@ -0,0 +1,132 @@
+# app/market_data.py
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from app.profiling import track_upstream
+from app.cache import TTLCache
+from app.market_hours import price_ttl, trend_ttl
+
+# Quotes and daily-bar history, expiring per the market-hours freshness policy.
+# Tickers without data are cached as None for a short while only; a batch that
+# came back empty (an upstream failure) is not cached at all.
+MISS_TTL = 60
+_quote_cache = TTLCache(maxsize=20000)
+_history_cache = TTLCache(maxsize=5000)
+_MISSING = object()
+
+
+def load_price_matrix(tickers, period="1y"):
+    """
+    Download daily closes for every ticker in a single batched request.
+    Returns (dates, tickers, prices) where `prices` is a (days x tickers)
+    float array. Tickers with no data are dropped; gaps are forward-filled.
+    """
+    tickers = sorted({t.upper() for t in tickers if t})
+    if not tickers:
+        return [], [], np.empty((0, 0))
+
+    try:
+        with track_upstream("yfinance.download", f"{len(tickers)} tickers, {period}"):
+            data = yf.download(tickers, period=period, progress=False, auto_adjust=True, threads=True)
+    except Exception as e:
+        print(f"Error downloading price matrix: {e}")
+        return [], [], np.empty((0, 0))
+
+    if data is None or data.empty:
+        return [], [], np.empty((0, 0))
+
+    close = data["Close"]
+    if isinstance(close, pd.Series):
+        close = close.to_frame(name=tickers[0])
+
+    # Keep column order stable, drop tickers that never traded in the window
+    close = close.reindex(columns=tickers).dropna(axis=1, how="all")
+    close = close.ffill().bfill().dropna(how="all")
+    if close.empty:
+        return [], [], np.empty((0, 0))
+
+    return list(close.index), [str(c) for c in close.columns], close.to_numpy(dtype=float)
+
+
+def shared_price_matrix():
+    """
+    A load_price_matrix replacement for one request: the first call
+    downloads, and later calls for a subset of those tickers and the same
+    period are sliced from it instead of downloading again.
+    """
+    loaded = {}
+
+    def load(tickers, period="1y"):
+        wanted = sorted({t.upper() for t in tickers if t})
+        hit = loaded.get(period)
+        if hit is None or not set(wanted) <= hit[0]:
+            dates, columns, prices = load_price_matrix(wanted, period)
+            loaded[period] = (set(wanted), (dates, columns, prices))
+            return dates, columns, prices
+        dates, columns, prices = hit[1]
+        cols = [i for i, t in enumerate(columns) if t in wanted]
+        if not cols:
+            return [], [], np.empty((0, 0))
+        return dates, [columns[i] for i in cols], prices[:, cols]
+
+    return load
+
+
+def latest_prices(tickers):
+    """
+    Most recent close for each ticker from one batched request.
+    Returns {ticker: float}; tickers without data are left out.
+    """
+    _, columns, prices = load_price_matrix(tickers, period="5d")
+    if len(columns) == 0:
+        return {}
+    return {t: float(prices[-1, i]) for i, t in enumerate(columns)}
+
+
+# ---------------- Cached Lookups ----------------
+def cached_latest_prices(tickers):
+    """
+    latest_prices() behind the quote cache: fresh tickers are served from
+    memory and only stale ones are downloaded, in one batched request.
+    Overnight and on weekends entries live until the next session opens.
+    """
+    tickers = {t.upper() for t in tickers if t}
+    result, stale = {}, []
+    for t in tickers:
+        price = _quote_cache.get(t, _MISSING)
+        if price is _MISSING:
+            stale.append(t)
+        elif price is not None:
+            result[t] = price
+    if stale:
+        fetched = latest_prices(stale)
+        if fetched:
+            ttl = price_ttl()
+            for t in stale:
+                _quote_cache.set(t, fetched.get(t), ttl if t in fetched else MISS_TTL)
+        result.update(fetched)
+    return result
+
+
+def cached_history(tickers, period="1mo"):
+    """
+    Daily closes per ticker as {ticker: pandas.Series}, cached with the trend
+    TTL. Misses are downloaded together in one batched request.
+    """
+    tickers = {t.upper() for t in tickers if t}
+    result, stale = {}, []
+    for t in tickers:
+        series = _history_cache.get((t, period), _MISSING)
+        if series is _MISSING:
+            stale.append(t)
+        elif series is not None:
+            result[t] = series
+    if stale:
+        dates, columns, prices = load_price_matrix(stale, period=period)
+        found = {t: pd.Series(prices[:, i], index=pd.DatetimeIndex(dates)) for i, t in enumerate(columns)}
+        if found:
+            ttl = trend_ttl()
+            for t in stale:
+                _history_cache.set((t, period), found.get(t), ttl if t in found else MISS_TTL)
+        result.update(found)
+    return result
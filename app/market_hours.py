@@ -0,0 +1,197 @@
+# app/market_hours.py
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+EXCHANGE_TZ = ZoneInfo("America/New_York")
+
+PRE_MARKET_OPEN = time(4, 0)
+REGULAR_OPEN = time(9, 30)
+REGULAR_CLOSE = time(16, 0)
+EARLY_CLOSE = time(13, 0)
+POST_MARKET_CLOSE = time(20, 0)
+EOD_DELAY = timedelta(minutes=20)   # let closing prints settle before end-of-day jobs
+
+# Freshness policy per session: (price TTL, trend TTL, poll interval) in seconds.
+# While closed, TTLs run until the next session opens and nothing is polled.
+POLICY = {
+    "regular": (60, 15 * 60, 60),
+    "pre": (5 * 60, 60 * 60, 5 * 60),
+    "post": (5 * 60, 60 * 60, 5 * 60),
+}
+MAX_CLOSED_TTL = 4 * 24 * 3600      # long weekends are at most four days
+
+
+# ---------------- Exchange Calendar (NYSE) ----------------
+def _nth_weekday(year, month, weekday, n):
+    """n-th `weekday` (Mon=0) of a month; n=-1 for the last one."""
+    if n > 0:
+        d = date(year, month, 1)
+        d += timedelta(days=(weekday - d.weekday()) % 7)
+        return d + timedelta(weeks=n - 1)
+    d = date(year, month + 1, 1) - timedelta(days=1) if month < 12 else date(year, 12, 31)
+    return d - timedelta(days=(d.weekday() - weekday) % 7)
+
+
+def _easter(year):
+    """Gregorian Easter Sunday (anonymous algorithm)."""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _observed(d):
+    """Saturday holidays are observed on Friday, Sunday holidays on Monday."""
+    if d.weekday() == 5:
+        return d - timedelta(days=1)
+    if d.weekday() == 6:
+        return d + timedelta(days=1)
+    return d
+
+
+@lru_cache(maxsize=32)
+def holidays(year):
+    """Full-day NYSE closures for a year."""
+    days = {
+        _nth_weekday(year, 1, 0, 3),            # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),            # Washington's Birthday
+        _easter(year) - timedelta(days=2),      # Good Friday
+        _nth_weekday(year, 5, 0, -1),           # Memorial Day
+        _observed(date(year, 7, 4)),            # Independence Day
+        _nth_weekday(year, 9, 0, 1),            # Labor Day
+        _nth_weekday(year, 11, 3, 4),           # Thanksgiving
+        _observed(date(year, 12, 25)),          # Christmas
+    }
+    # New Year's Day falling on a Saturday is not observed on the prior Friday
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        days.add(_observed(new_year))
+    if year >= 2022:
+        days.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return frozenset(days)
+
+
+@lru_cache(maxsize=32)
+def early_closes(year):
+    """Days the regular session ends at 1 p.m."""
+    days = {
+        date(year, 7, 3),                                   # eve of Independence Day
+        _nth_weekday(year, 11, 3, 4) + timedelta(days=1),   # day after Thanksgiving
+        date(year, 12, 24),                                 # Christmas Eve
+    }
+    return frozenset(d for d in days if is_trading_day(d))
+
+
+def is_trading_day(d):
+    return d.weekday() < 5 and d not in holidays(d.year)
+
+
+def previous_trading_day(d):
+    """The most recent trading day on or before `d`."""
+    while not is_trading_day(d):
+        d -= timedelta(days=1)
+    return d
+
+
+def next_trading_day(d):
+    """The first trading day on or after `d`."""
+    while not is_trading_day(d):
+        d += timedelta(days=1)
+    return d
+
+
+def close_time(d):
+    return EARLY_CLOSE if d in early_closes(d.year) else REGULAR_CLOSE
+
+
+# ---------------- Sessions ----------------
+def now_local(now=None):
+    """`now` (naive UTC or aware) as exchange-local time."""
+    now = now or datetime.utcnow()
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=ZoneInfo("UTC"))
+    return now.astimezone(EXCHANGE_TZ)
+
+
+def session_at(now=None):
+    """"pre", "regular", "post" or "closed" at the given moment."""
+    local = now_local(now)
+    d, t = local.date(), local.time()
+    if not is_trading_day(d):
+        return "closed"
+    close = close_time(d)
+    if REGULAR_OPEN <= t < close:
+        return "regular"
+    if PRE_MARKET_OPEN <= t < REGULAR_OPEN:
+        return "pre"
+    # Early-close days have no extended post-market session
+    if close <= t < POST_MARKET_CLOSE and close == REGULAR_CLOSE:
+        return "post"
+    return "closed"
+
+
+def next_open(now=None):
+    """Start of the next pre-market session (exchange-local, aware)."""
+    local = now_local(now)
+    d = local.date()
+    if local.time() >= PRE_MARKET_OPEN:
+        d += timedelta(days=1)
+    d = next_trading_day(d)
+    return datetime.combine(d, PRE_MARKET_OPEN, tzinfo=EXCHANGE_TZ)
+
+
+def last_close(now=None):
+    """The most recent regular-session close at or before `now` (exchange-local, aware)."""
+    local = now_local(now)
+    d = previous_trading_day(local.date())
+    if d == local.date() and local.time() < close_time(d):
+        d = previous_trading_day(d - timedelta(days=1))
+    return datetime.combine(d, close_time(d), tzinfo=EXCHANGE_TZ)
+
+
+def market_date(now=None):
+    """
+    The trading day whose closing prices are the latest available:
+    today once the session has opened, otherwise the previous trading day.
+    """
+    local = now_local(now)
+    d = local.date()
+    if is_trading_day(d) and local.time() >= REGULAR_OPEN:
+        return d
+    return previous_trading_day(d - timedelta(days=1))
+
+
+# ---------------- Freshness Policy ----------------
+def _until_next_open(now):
+    seconds = (next_open(now) - now_local(now)).total_seconds()
+    return int(min(max(seconds, 60), MAX_CLOSED_TTL))
+
+
+def price_ttl(now=None):
+    """How long a quote may be served from cache."""
+    policy = POLICY.get(session_at(now))
+    return policy[0] if policy else _until_next_open(now)
+
+
+def trend_ttl(now=None):
+    """How long daily-bar history (trends, suggestion inputs) may be cached."""
+    policy = POLICY.get(session_at(now))
+    return policy[1] if policy else _until_next_open(now)
+
+
+def poll_interval(now=None):
+    """Seconds between price polls, or None when nothing should be polled."""
+    policy = POLICY.get(session_at(now))
+    return policy[2] if policy else None
+
+
+def eod_due_at(d):
+    """When end-of-day jobs for trading day `d` may start (exchange-local, aware)."""
+    return datetime.combine(d, close_time(d), tzinfo=EXCHANGE_TZ) + EOD_DELAY
@@ -41,6 +41,11 @@ class Holding(db.Model):
     # Relationship back to the User model
     user = db.relationship("User", backref=db.backref("holdings", lazy=True))
 
+    # Reverse index: ticker -> holders, so a price tick only touches affected users
+    __table_args__ = (
+        db.Index('ix_holdings_ticker_user', 'ticker', 'user_id'),
+    )
+
     def __repr__(self):
         return f'<Holding {self.ticker} x {self.quantity} (User:{self.user_id})>'
 
@@ -107,4 +112,240 @@ class Admin(db.Model):
     email = db.Column(db.String(150), unique=True, nullable=False)
     password_hash = db.Column(db.String(256), nullable=False)
 
-    
\ No newline at end of file
+    
+
+class BacktestResult(db.Model):
+    """Nightly replay of each fallback strategy against a user's holdings and thresholds."""
+    __tablename__ = "backtest_results"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete='CASCADE'), nullable=False)
+    run_date = db.Column(db.Date, nullable=False, default=date.today)
+    strategy = db.Column(db.String(50), nullable=False)
+    total_return = db.Column(db.Float, nullable=False)
+    max_drawdown = db.Column(db.Float, nullable=False)
+    final_value = db.Column(db.Numeric(15, 2), nullable=False)
+
+    # One row per strategy per user per run
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'run_date', 'strategy', name='_user_run_strategy_uc'),
+    )
+
+    def __repr__(self):
+        return f"<Backtest User:{self.user_id} {self.strategy} Return:{self.total_return:.2%}>"
+
+
+class ThresholdSuggestion(db.Model):
+    """AI threshold suggestion per ticker, computed at most once per trading day."""
+    __tablename__ = "threshold_suggestions"
+
+    id = db.Column(db.Integer, primary_key=True)
+    ticker = db.Column(db.String(10), nullable=False)
+    trading_day = db.Column(db.Date, nullable=False)
+    suggested = db.Column(db.Numeric(10, 2), nullable=True)  # only real values are written
+
+    # Doubles as the lookup index for (ticker, trading_day)
+    __table_args__ = (
+        db.UniqueConstraint('ticker', 'trading_day', name='_ticker_day_suggestion_uc'),
+    )
+
+    def __repr__(self):
+        return f"<ThresholdSuggestion {self.ticker} {self.trading_day}: {self.suggested}>"
+
+
+class Trade(db.Model):
+    """Append-only ledger of every buy and sell. Rows are never updated."""
+    __tablename__ = "trades"
+
+    trade_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    ticker = db.Column(db.String(10), nullable=False)
+    side = db.Column(db.String(4), nullable=False)  # "buy" or "sell"
+    quantity = db.Column(db.Integer, nullable=False)
+    price = db.Column(db.Numeric(10, 2), nullable=False)
+    executed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_trades_user_executed', 'user_id', 'executed_at'),
+    )
+
+    def __repr__(self):
+        return f'<Trade {self.side} {self.ticker} x {self.quantity} @ {self.price} (User:{self.user_id})>'
+
+
+class PositionSnapshot(db.Model):
+    """Compacted positions as of a trade id; the ledger is replayed from here."""
+    __tablename__ = "position_snapshots"
+
+    snapshot_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    taken_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_trade_id = db.Column(db.Integer, nullable=False, default=0)
+    positions = db.Column(db.JSON, nullable=False)  # {ticker: [quantity, avg_price]}
+
+    __table_args__ = (
+        db.Index('ix_snapshots_user_taken', 'user_id', 'taken_at'),
+    )
+
+    def __repr__(self):
+        return f'<PositionSnapshot User:{self.user_id} At:{self.taken_at} Trade:{self.last_trade_id}>'
+
+
+class Security(db.Model):
+    """
+    Security master: one row per ticker with reference data (name, sector,
+    logo) and the screener's precomputed metrics. Other tables join on ticker.
+    """
+    __tablename__ = "securities"
+
+    ticker = db.Column(db.String(10), primary_key=True)
+    name = db.Column(db.String(120), nullable=False)
+    sector = db.Column(db.String(50), index=True)
+    industry = db.Column(db.String(100))
+    description = db.Column(db.Text)
+    logo = db.Column(db.String(100))
+    metadata_updated_at = db.Column(db.DateTime, index=True)  # NULL until reference data is fetched
+
+    # Refreshed in bulk by the universe job, never per request
+    last_price = db.Column(db.Numeric(10, 2))
+    momentum_1m = db.Column(db.Float, index=True)
+    momentum_3m = db.Column(db.Float)
+    recent_closes = db.Column(db.JSON)  # last week of closes for the trend graph
+    # Bumped by writes the screener index shows, never by price marks
+    screener_updated_at = db.Column(db.DateTime, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<Security {self.ticker} {self.sector}>"
+
+
+class PortfolioValuePoint(db.Model):
+    """Intraday portfolio value at minute, hour or day resolution."""
+    __tablename__ = "portfolio_value_points"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete='CASCADE'), nullable=False)
+    tier = db.Column(db.String(6), nullable=False)  # "minute", "hour" or "day"
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    value = db.Column(db.Numeric(15, 2), nullable=False)  # last value seen in the bucket
+    low = db.Column(db.Numeric(15, 2), nullable=False)
+    high = db.Column(db.Numeric(15, 2), nullable=False)
+
+    # Also serves range scans for charts and retention deletes
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'tier', 'bucket_start', name='_user_tier_bucket_uc'),
+        db.Index('ix_value_points_tier_bucket', 'tier', 'bucket_start'),
+    )
+
+    def __repr__(self):
+        return f"<ValuePoint User:{self.user_id} {self.tier} {self.bucket_start} Value:{self.value}>"
+
+
+class NewsArticle(db.Model):
+    """Locally archived NewsAPI article, deduplicated by URL."""
+    __tablename__ = "news_articles"
+
+    article_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    url_hash = db.Column(db.String(64), unique=True, nullable=False)  # sha256 of the URL
+    url = db.Column(db.Text, nullable=False)
+    title = db.Column(db.String(500), nullable=False)
+    description = db.Column(db.Text)
+    source = db.Column(db.String(200))
+    url_to_image = db.Column(db.Text)
+    published_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<NewsArticle {self.article_id} {self.title[:40]!r}>"
+
+
+class NewsTerm(db.Model):
+    """Inverted index posting: one row per (term, article)."""
+    __tablename__ = "news_terms"
+
+    term = db.Column(db.String(32), primary_key=True)
+    article_id = db.Column(db.Integer, db.ForeignKey("news_articles.article_id", ondelete='CASCADE'), primary_key=True)
+    published_at = db.Column(db.DateTime, nullable=False)  # denormalized so feeds sort inside the index
+
+    __table_args__ = (
+        db.Index('ix_news_terms_term_published', 'term', 'published_at'),
+    )
+
+    def __repr__(self):
+        return f"<NewsTerm {self.term} -> {self.article_id}>"
+
+
+class TargetAllocation(db.Model):
+    """A user's target weight for one ticker or one sector (weights sum to at most 1)."""
+    __tablename__ = "target_allocations"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    kind = db.Column(db.String(6), nullable=False)  # "ticker" or "sector"
+    key = db.Column(db.String(50), nullable=False)  # ticker symbol or sector name
+    weight = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'kind', 'key', name='_user_target_uc'),
+    )
+
+    def __repr__(self):
+        return f"<TargetAllocation User:{self.user_id} {self.kind}:{self.key} {self.weight:.1%}>"
+
+
+class RebalanceOrder(db.Model):
+    """Whole-share order proposed by the nightly rebalance run, pending user review."""
+    __tablename__ = "rebalance_orders"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    run_date = db.Column(db.Date, nullable=False, default=date.today)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    ticker = db.Column(db.String(10), nullable=False)
+    side = db.Column(db.String(4), nullable=False)  # "buy" or "sell"
+    quantity = db.Column(db.Integer, nullable=False)
+    price = db.Column(db.Numeric(10, 2), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_rebalance_orders_user_run', 'user_id', 'run_date'),
+    )
+
+    def __repr__(self):
+        return f"<RebalanceOrder User:{self.user_id} {self.side} {self.ticker} x {self.quantity}>"
+
+
+class RebalanceRun(db.Model):
+    """One user's nightly rebalance result, written even when no orders were needed."""
+    __tablename__ = "rebalance_runs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    run_date = db.Column(db.Date, nullable=False, default=date.today)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    notes = db.Column(db.JSON, nullable=False, default=dict)  # {"unfilled": [...], "missing": [...], "untargeted": [...]}
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'run_date', name='_user_rebalance_run_uc'),
+    )
+
+    def __repr__(self):
+        return f"<RebalanceRun User:{self.user_id} {self.run_date}>"
+
+
+class PortfolioValuation(db.Model):
+    """
+    Materialized portfolio totals per user, kept current by price ticks and
+    trades so reads never recompute from holdings. Positions are marked at
+    Security.last_price, or the purchase price until the ticker is priced.
+    """
+    __tablename__ = "portfolio_valuations"
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    market_value = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    cash_balance = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    invested = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    total_value = db.Column(db.Numeric(15, 2), nullable=False, default=0)  # as of the last mark or trade; reads add live cash
+    sector_values = db.Column(db.JSON, nullable=False, default=dict)  # {sector: "value"}
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<PortfolioValuation User:{self.user_id} Total:{self.total_value}>"
@@ -0,0 +1,299 @@
+# app/news_archive.py
+from app import db
+from app.models import NewsArticle, NewsTerm, Holding, Threshold, Security
+from app.config import NEWS_API_KEY
+from app.profiling import track_upstream
+from app.upserts import insert_ignore
+from datetime import datetime, timedelta
+import hashlib
+import re
+import requests
+
+NEWS_API_URL = "https://newsapi.org/v2/everything"
+GENERAL_QUERY = "stocks OR market OR finance"
+TICKERS_PER_QUERY = 10      # keeps NewsAPI "q" well under its length limit
+MAX_TERM_LENGTH = 32
+BACKFILL_DAYS = 30          # archived articles re-scanned for newly tracked company names
+
+_TOKEN_RE = re.compile(r"\$?[A-Za-z][A-Za-z0-9.&-]*")
+_STOPWORDS = {
+    "the", "and", "for", "with", "from", "that", "this", "are", "was", "were", "has",
+    "have", "its", "but", "not", "you", "your", "our", "will", "can", "after", "over",
+    "into", "than", "about", "more", "new", "says", "said", "how", "why", "what", "who",
+    "inc", "corp", "co", "ltd", "plc", "group",
+}
+# All-caps headline words that are real symbols too often to index bare;
+# they still count when written as a $cashtag
+_CAPS_STOPWORDS = {
+    "A", "I", "AI", "AM", "PM", "US", "USA", "UK", "EU", "UN", "CEO", "CFO", "CTO", "COO",
+    "IPO", "ETF", "GDP", "CPI", "FED", "SEC", "FDA", "FTC", "DOJ", "IRS", "EV", "EVS",
+    "TV", "IT", "ON", "OR", "AT", "BE", "SO", "ALL", "NOW", "NEW", "ARE", "FOR", "ONE",
+    "Q1", "Q2", "Q3", "Q4", "YOY", "EPS", "NYSE", "AP", "OK",
+}
+
+# Company-name matching works on whole normalized names, never single words
+NAME_TERM_PREFIX = "name:"
+_NAME_WORD_RE = re.compile(r"[a-z0-9&]+")
+_POSSESSIVE_RE = re.compile(r"['\u2019]s\b")
+_COMPANY_SUFFIXES = {
+    "inc", "incorporated", "corp", "corporation", "co", "company", "ltd", "limited",
+    "plc", "group", "holding", "holdings", "llc", "lp", "sa", "nv", "ag", "the",
+}
+# Names a company is commonly reported under besides its registered one
+NAME_ALIASES = {
+    "GOOG": ("google", "alphabet"),
+    "GOOGL": ("google", "alphabet"),
+    "META": ("facebook",),
+    "BRK-B": ("berkshire hathaway",),
+    "BRK-A": ("berkshire hathaway",),
+    "KO": ("coca cola",),
+    "JPM": ("jpmorgan",),
+}
+
+
+# ---------------- Indexing ----------------
+def tokenize(text, symbols=frozenset()):
+    """
+    Index terms for a piece of text. $cashtags, and all-caps tokens that are
+    known `symbols` (and not common headline words), are kept upper-case as
+    ticker terms; other words are lower-cased.
+    """
+    terms = set()
+    for token in _TOKEN_RE.findall(text or ""):
+        token = token.strip(".&-")
+        if not token:
+            continue
+        if token.startswith("$"):
+            terms.add(token[1:].upper())
+        elif token.isupper() and len(token) <= 5:
+            if token in symbols and token not in _CAPS_STOPWORDS:
+                terms.add(token)
+        else:
+            word = token.lower()
+            if len(word) >= 3 and word not in _STOPWORDS:
+                terms.add(word)
+    return {t[:MAX_TERM_LENGTH] for t in terms}
+
+
+def normalize_name(text):
+    """Lower-cased words with possessives and apostrophes dropped ("McDonald's" -> "mcdonald")."""
+    text = _POSSESSIVE_RE.sub("", (text or "").lower()).replace("'", "").replace("\u2019", "")
+    return " ".join(_NAME_WORD_RE.findall(text))
+
+
+def company_phrase(name):
+    """A registered company name without legal suffixes ("Bank of America Corp." -> "bank of america")."""
+    words = normalize_name(name).split()
+    while words and words[-1] in _COMPANY_SUFFIXES:
+        words.pop()
+    while words and words[0] == "the":
+        words.pop(0)
+    return " ".join(words)
+
+
+def name_term(phrase):
+    return (NAME_TERM_PREFIX + phrase)[:MAX_TERM_LENGTH]
+
+
+def company_terms(tickers):
+    """{phrase: ticker} for the full names and curated aliases of `tickers`."""
+    tickers = [t.upper() for t in tickers]
+    phrases = {}
+    if tickers:
+        for ticker, name in db.session.query(Security.ticker, Security.name).filter(Security.ticker.in_(tickers)):
+            phrase = company_phrase(name)
+            # Placeholder rows carry the ticker as their name
+            if len(phrase) >= 3 and phrase != ticker.lower():
+                phrases[phrase] = ticker.upper()
+    for ticker in tickers:
+        for alias in NAME_ALIASES.get(ticker, ()):
+            phrases[alias] = ticker
+    return phrases
+
+
+def name_terms(text, phrases):
+    """Index terms for every company phrase that appears as whole words in `text`."""
+    padded = f" {normalize_name(text)} "
+    return {name_term(p) for p in phrases if f" {p} " in padded}
+
+
+def url_hash(url):
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def _parse_published(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ")
+    except (TypeError, ValueError):
+        return datetime.utcnow()
+
+
+def ingest_articles(articles, phrases=None):
+    """
+    Store NewsAPI articles not seen before (deduplicated by URL) and add their
+    terms to the inverted index, including a name term for each tracked
+    company mentioned by name. Returns the number of new articles.
+    """
+    fresh = {}
+    for a in articles:
+        url = a.get("url")
+        if url and a.get("title"):
+            fresh.setdefault(url_hash(url), a)
+    if not fresh:
+        return 0
+
+    known = {h for (h,) in db.session.query(NewsArticle.url_hash)
+             .filter(NewsArticle.url_hash.in_(list(fresh)))}
+    new = {h: a for h, a in fresh.items() if h not in known}
+    if not new:
+        return 0
+
+    # Overlapping refreshes may store the same URL; the unique url_hash decides
+    insert_ignore(NewsArticle, [{
+        "url_hash": h,
+        "url": a["url"],
+        "title": a["title"][:500],
+        "description": a.get("description"),
+        "source": ((a.get("source") or {}).get("name") or "")[:200] or None,
+        "url_to_image": a.get("urlToImage"),
+        "published_at": _parse_published(a.get("publishedAt")),
+    } for h, a in new.items()], keys=["url_hash"])
+
+    stored = db.session.query(NewsArticle.article_id, NewsArticle.url_hash, NewsArticle.published_at) \
+        .filter(NewsArticle.url_hash.in_(list(new)))
+    if phrases is None:
+        phrases = company_terms(tracked_tickers())
+    symbols = known_symbols()
+    postings = []
+    for article_id, h, published_at in stored:
+        a = new[h]
+        text = f"{a['title']} {a.get('description') or ''}"
+        for term in tokenize(text, symbols) | name_terms(text, phrases):
+            postings.append({"term": term, "article_id": article_id, "published_at": published_at})
+    insert_ignore(NewsTerm, postings, keys=["term", "article_id"])
+    db.session.commit()
+    return len(new)
+
+
+# ---------------- Fetching ----------------
+def fetch_news(query, page_size=50):
+    """One NewsAPI request; returns the raw article list."""
+    params = {
+        "q": query,
+        "apiKey": NEWS_API_KEY,
+        "language": "en",
+        "sortBy": "publishedAt",
+        "pageSize": page_size,
+    }
+    try:
+        with track_upstream("newsapi.everything", query):
+            response = requests.get(NEWS_API_URL, params=params, timeout=10)
+        response.raise_for_status()
+        return response.json().get("articles", [])
+    except Exception as e:
+        print("Error fetching news:", e)
+        return []
+
+
+def tracked_tickers():
+    """Every ticker any user holds or watches."""
+    tickers = {t.upper() for (t,) in db.session.query(Holding.ticker).distinct()}
+    tickers |= {t.upper() for (t,) in db.session.query(Threshold.ticker).distinct()}
+    return sorted(tickers)
+
+
+def known_symbols():
+    """Tickers in the security master plus every tracked one."""
+    return {t.upper() for (t,) in db.session.query(Security.ticker)} | set(tracked_tickers())
+
+
+def backfill_name_terms(phrases, days=BACKFILL_DAYS):
+    """
+    Add name terms to archived articles from the last `days`. Name terms are
+    otherwise only written at ingest, so a company tracked after its news
+    was archived would never match it. Returns the number of postings added.
+    """
+    if not phrases:
+        return 0
+    since = datetime.utcnow() - timedelta(days=days)
+    postings = []
+    for article_id, title, description, published_at in (
+            db.session.query(NewsArticle.article_id, NewsArticle.title,
+                             NewsArticle.description, NewsArticle.published_at)
+            .filter(NewsArticle.published_at >= since)):
+        for term in name_terms(f"{title} {description or ''}", phrases):
+            postings.append({"term": term, "article_id": article_id, "published_at": published_at})
+    insert_ignore(NewsTerm, postings, keys=["term", "article_id"])
+    db.session.commit()
+    return len(postings)
+
+
+def refresh_archive():
+    """
+    Scheduled job: pull general market news plus news for all tracked tickers
+    (batched into OR queries) into the archive, after backfilling name terms
+    for recently archived articles. Returns new article count.
+    """
+    tickers = tracked_tickers()
+    phrases = company_terms(tickers)
+    backfill_name_terms(phrases)
+    added = ingest_articles(fetch_news(GENERAL_QUERY), phrases)
+    for start in range(0, len(tickers), TICKERS_PER_QUERY):
+        chunk = tickers[start:start + TICKERS_PER_QUERY]
+        added += ingest_articles(fetch_news(" OR ".join(chunk)), phrases)
+    return added
+
+
+# ---------------- Feeds ----------------
+def user_terms(user_id):
+    """
+    {index term: ticker} for a user: their tickers plus the name terms of
+    each company's full name and curated aliases.
+    """
+    tickers = {t.upper() for (t,) in db.session.query(Holding.ticker).filter_by(user_id=user_id)}
+    tickers |= {t.upper() for (t,) in db.session.query(Threshold.ticker).filter_by(user_id=user_id)}
+    terms = {t: t for t in tickers}
+    for phrase, ticker in company_terms(tickers).items():
+        terms[name_term(phrase)] = ticker
+    return terms
+
+
+def _to_dict(a, matched=()):
+    return {
+        "url": a.url,
+        "title": a.title,
+        "description": a.description,
+        "source": a.source,
+        "urlToImage": a.url_to_image,
+        "publishedAt": a.published_at.strftime("%Y-%m-%d %H:%M"),
+        "tickers": sorted(matched),
+    }
+
+
+def latest_articles(limit=10):
+    return [_to_dict(a) for a in
+            NewsArticle.query.order_by(NewsArticle.published_at.desc()).limit(limit)]
+
+
+def user_feed(user_id, limit=20):
+    """
+    Newest articles mentioning any of the user's terms. Each term reads at
+    most `limit` postings from the (term, published_at) index, so the cost
+    does not grow with the archive.
+    """
+    terms = user_terms(user_id)
+    hits = {}
+    for term, ticker in terms.items():
+        postings = (db.session.query(NewsTerm.article_id, NewsTerm.published_at)
+                    .filter(NewsTerm.term == term)
+                    .order_by(NewsTerm.published_at.desc())
+                    .limit(limit))
+        for article_id, published_at in postings:
+            hits.setdefault(article_id, [published_at, set()])[1].add(ticker)
+
+    newest = sorted(hits.items(), key=lambda kv: kv[1][0], reverse=True)[:limit]
+    if not newest:
+        return []
+    articles = {a.article_id: a for a in
+                NewsArticle.query.filter(NewsArticle.article_id.in_([i for i, _ in newest]))}
+    return [_to_dict(articles[i], matched) for i, (_, matched) in newest if i in articles]
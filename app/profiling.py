@@ -0,0 +1,210 @@
+# app/profiling.py
+from flask import g, request, session, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from contextlib import contextmanager
+from collections import Counter
+from datetime import datetime
+import cProfile
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+
+MAX_RECORDED_STATEMENTS = 500
+
+
+# ---------------- Upstream Call Tracking ----------------
+@contextmanager
+def track_upstream(name, detail=""):
+    """Time an upstream (yfinance / NewsAPI) call for the current request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context() and "upstream_calls" in g:
+            g.upstream_calls.append({
+                "call": name,
+                "detail": str(detail)[:200],
+                "ms": round((time.perf_counter() - start) * 1000, 2),
+            })
+
+
+# ---------------- SQL Timing ----------------
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info["query_start"].pop()
+    if has_request_context() and "sql_statements" in g:
+        g.sql_count += 1
+        elapsed = (time.perf_counter() - start) * 1000
+        g.sql_ms += elapsed
+        if len(g.sql_statements) < MAX_RECORDED_STATEMENTS:
+            g.sql_statements.append({"sql": statement, "ms": round(elapsed, 2)})
+
+
+# ---------------- Stack Sampler ----------------
+class StackSampler:
+    """
+    Samples one thread's Python stack on an interval and aggregates the
+    stacks in the collapsed format used by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def write(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+# ---------------- Request Hooks ----------------
+def _requested_mode(app):
+    """'cprofile', 'sample' or None for the current request."""
+    header = request.headers.get(app.config["PROFILE_HEADER"], "").strip().lower()
+    if header and "admin_id" in session:
+        return "sample" if header == "sample" else "cprofile"
+    rate = app.config["PROFILE_SAMPLE_RATE"]
+    if rate and random.random() < rate:
+        return "sample"
+    return None
+
+
+def init_profiling(app):
+    """Register per-request timing, on-demand profiling and the slow-request log."""
+
+    @app.before_request
+    def _start_request_timing():
+        g.request_start = time.perf_counter()
+        g.sql_statements, g.sql_count, g.sql_ms = [], 0, 0.0
+        g.upstream_calls = []
+        g.profile_mode = _requested_mode(app)
+
+        if g.profile_mode:
+            # Concurrent profiled requests share one tracer; the first one owns
+            # it, and only the owner's peak is this request's own
+            g.owns_tracemalloc = not tracemalloc.is_tracing()
+            if g.owns_tracemalloc:
+                tracemalloc.start()
+                tracemalloc.reset_peak()
+            if g.profile_mode == "cprofile":
+                g.profiler = cProfile.Profile()
+                try:
+                    g.profiler.enable()
+                except ValueError:
+                    # Only one cProfile can be active per process on newer Pythons
+                    g.profile_mode = "sample"
+            if g.profile_mode == "sample":
+                g.profiler = StackSampler(threading.get_ident(), app.config["PROFILE_SAMPLE_INTERVAL"])
+                g.profiler.start()
+
+    @app.after_request
+    def _finish_request_timing(response):
+        if "request_start" not in g:
+            return response
+        elapsed_ms = (time.perf_counter() - g.request_start) * 1000
+
+        summary = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "ms": round(elapsed_ms, 2),
+            "sql_count": g.sql_count,
+            "sql_ms": round(g.sql_ms, 2),
+            "upstream_count": len(g.upstream_calls),
+            "upstream_ms": round(sum(c["ms"] for c in g.upstream_calls), 2),
+        }
+
+        if g.get("profiler") is not None:
+            # Files are written at teardown, once the profiler has stopped
+            g.profile_summary = summary
+            g.profile_id = _profile_id()
+            response.headers["X-Profile-Id"] = g.profile_id
+
+        if elapsed_ms > app.config["SLOW_REQUEST_MS"]:
+            slowest = sorted(g.sql_statements, key=lambda s: s["ms"], reverse=True)[:3]
+            app.logger.warning(
+                "Slow request %s %s took %.0fms (sql: %d in %.0fms, upstream: %d in %.0fms) "
+                "slowest sql: %s slowest upstream: %s",
+                summary["method"], summary["path"], elapsed_ms,
+                summary["sql_count"], summary["sql_ms"],
+                summary["upstream_count"], summary["upstream_ms"],
+                [s["sql"][:120] for s in slowest],
+                sorted(g.upstream_calls, key=lambda c: c["ms"], reverse=True)[:3],
+            )
+
+        return response
+
+    @app.teardown_request
+    def _stop_profiling(exc):
+        # Teardown runs even when the view raised (after_request does not),
+        # so the profiler, sampler thread and tracer are always stopped
+        profiler = g.pop("profiler", None)
+        if profiler is None:
+            return
+        if g.profile_mode == "cprofile":
+            profiler.disable()
+        else:
+            profiler.stop()
+        peak = tracemalloc.get_traced_memory()[1] if g.owns_tracemalloc else None
+        if g.owns_tracemalloc:
+            tracemalloc.stop()
+
+        summary = g.pop("profile_summary", None)
+        if summary is not None:
+            if peak is not None:
+                summary["tracemalloc_peak_kb"] = round(peak / 1024, 1)
+            _write_profile(app, profiler, g.profile_id, summary)
+
+
+def _profile_id():
+    endpoint = (request.endpoint or "unknown").replace(".", "_")
+    return f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{endpoint}"
+
+
+def _write_profile(app, profiler, profile_id, summary):
+    """Write the profile (.prof or .folded) plus a JSON summary."""
+    directory = app.config["PROFILE_DIR"]
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, profile_id)
+
+    if g.profile_mode == "cprofile":
+        profiler.dump_stats(base + ".prof")       # open with snakeviz / flameprof
+    else:
+        profiler.write(base + ".folded")          # feed to flamegraph.pl / speedscope
+
+    with open(base + ".json", "w") as f:
+        json.dump(dict(summary,
+                       mode=g.profile_mode,
+                       sql=g.sql_statements,
+                       upstream=g.upstream_calls), f, indent=2)
@@ -0,0 +1,142 @@
+# app/projection.py
+from app.models import Holding, Portfolio, PortfolioHistory
+from app.market_data import load_price_matrix
+from app.cache import DailyCache
+from datetime import date, timedelta
+from decimal import Decimal
+import numpy as np
+
+HORIZONS = {"1m": 21, "3m": 63, "6m": 126, "1y": 252, "3y": 756}   # trading days
+DEFAULT_HORIZON = "1y"
+DEFAULT_PATHS = 10_000
+PERCENTILES = (5, 25, 50, 75, 95)
+MAX_CHECKPOINTS = 60            # points per band on the chart
+CHUNK_ELEMENTS = 2_000_000      # normal draws held in memory per chunk (~16 MB)
+HISTORY_DAYS = 90               # actual values shown before the projection
+
+# Projections keyed by (user_id, holdings signature, horizon, paths), reset every trading day
+_projection_cache = DailyCache(maxsize=512)
+
+
+# ---------------- Simulation ----------------
+def cholesky_factor(cov):
+    """Cholesky factor of a covariance matrix, nudging it positive definite if needed."""
+    cov = np.atleast_2d(cov)
+    jitter = 1e-10 * max(float(np.trace(cov)) / len(cov), 1e-12)
+    for _ in range(6):
+        try:
+            return np.linalg.cholesky(cov + jitter * np.eye(len(cov)))
+        except np.linalg.LinAlgError:
+            jitter *= 100
+    # Fall back to clipping negative eigenvalues (e.g. fewer days than holdings)
+    vals, vecs = np.linalg.eigh(cov)
+    return vecs * np.sqrt(np.clip(vals, 0, None))
+
+
+def simulate_chunk(drift, factor, values, cash, paths, checkpoints, seed):
+    """
+    Portfolio values at `checkpoints` (days) for `paths` correlated paths.
+    Daily log returns are drift + factor @ z with z ~ N(0, I). A k-day step
+    of i.i.d. normal returns is itself normal with mean k * drift and factor
+    sqrt(k) * factor, so each path only draws one step per checkpoint rather
+    than one per day. Returns (paths x checkpoints).
+    """
+    rng = np.random.default_rng(seed)
+    steps = np.diff(checkpoints, prepend=0)[:, None]
+    z = rng.standard_normal((paths, len(checkpoints), len(drift)))
+    log_returns = np.cumsum(np.sqrt(steps) * (z @ factor.T) + steps * drift, axis=1)
+    return cash + np.exp(log_returns) @ values
+
+
+def simulate_paths(drift, factor, values, cash, paths, checkpoints, seed=None):
+    """
+    Run `paths` simulations in memory-bounded chunks with independent random
+    streams, in-process: with one draw per checkpoint the vectorized chunks
+    finish faster than worker processes would start.
+    """
+    draws = len(checkpoints) * len(drift)
+    per_chunk = max(1, CHUNK_ELEMENTS // draws)
+    sizes = [min(per_chunk, paths - start) for start in range(0, paths, per_chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    return np.concatenate([simulate_chunk(drift, factor, values, cash, n, checkpoints, s)
+                           for n, s in zip(sizes, seeds)])
+
+
+def checkpoint_days(horizon):
+    """Evenly spaced days 1..horizon (always including the last one)."""
+    return np.unique(np.linspace(1, horizon, min(horizon, MAX_CHECKPOINTS)).round().astype(int))
+
+
+def project_values(prices, quantities, cash, horizon, paths=DEFAULT_PATHS, seed=None):
+    """
+    Percentile bands of future portfolio value from a (days x holdings)
+    price history, current share counts and cash (held flat).
+    """
+    log_returns = np.diff(np.log(prices), axis=0)
+    values = prices[-1] * quantities
+    drift = log_returns.mean(axis=0)
+    factor = cholesky_factor(np.cov(log_returns, rowvar=False))
+
+    days = checkpoint_days(horizon)
+    sims = simulate_paths(drift, factor, values, cash, paths, days, seed)
+    bands = np.percentile(sims, PERCENTILES, axis=0)
+    final = sims[:, -1]
+    start = float(values.sum() + cash)
+    return {
+        "start_value": start,
+        "days": days.tolist(),
+        "bands": {p: bands[i].round(2).tolist() for i, p in enumerate(PERCENTILES)},
+        "expected": float(final.mean()),
+        "prob_loss": float((final < start).mean()),
+        "paths": paths,
+    }
+
+
+# ---------------- Entry Point ----------------
+def _history(user_id):
+    since = date.today() - timedelta(days=HISTORY_DAYS)
+    rows = (PortfolioHistory.query
+            .filter(PortfolioHistory.user_id == user_id, PortfolioHistory.date >= since)
+            .order_by(PortfolioHistory.date)
+            .all())
+    return [(r.date, float(r.total_value)) for r in rows]
+
+
+def project_portfolio(user_id, horizon=DEFAULT_HORIZON, paths=DEFAULT_PATHS, load=None):
+    """
+    Projected value report for a user's holdings, cached per user per
+    trading day. Past values come from PortfolioHistory so the chart runs
+    from recent actuals into the projected bands. `load` stands in for
+    load_price_matrix (see shared_price_matrix).
+    """
+    positions = {}
+    for h in Holding.query.filter_by(user_id=user_id):
+        positions[h.ticker.upper()] = positions.get(h.ticker.upper(), 0) + h.quantity
+    positions = {t: q for t, q in positions.items() if q > 0}
+    if not positions:
+        return None
+    portfolio = Portfolio.query.filter_by(user_id=user_id).first()
+    cash = Decimal(portfolio.cash_balance) if portfolio else Decimal("0")
+
+    key = (user_id, tuple(sorted(positions.items())), str(cash), horizon, paths)
+    cached = _projection_cache.get(key)
+    if cached is not None:
+        return cached
+
+    dates, tickers, prices = (load or load_price_matrix)(list(positions), period="1y")
+    if len(dates) < 3:
+        return None
+    quantities = np.array([positions[t] for t in tickers], dtype=float)
+    result = project_values(prices, quantities, float(cash), HORIZONS[horizon], paths,
+                            seed=user_id)
+
+    # Trading days mapped to calendar dates for the chart axis
+    today = date.today()
+    result["labels"] = [(today + timedelta(days=round(d * 365 / 252))).strftime("%m/%d/%y")
+                        for d in result["days"]]
+    history = _history(user_id)
+    result["history_labels"] = [d.strftime("%m/%d/%y") for d, _ in history]
+    result["history_values"] = [v for _, v in history]
+    result["horizon"] = horizon
+    result["missing"] = sorted(set(positions) - set(tickers))
+    return _projection_cache.set(key, result)
@@ -0,0 +1,333 @@
+# app/rebalance.py
+from app import db
+from app.models import Holding, Portfolio, Security, TargetAllocation, RebalanceOrder, RebalanceRun, Trade
+from app.market_data import latest_prices
+from app.ledger import record_trades, maybe_snapshot
+from app.securities import ensure_securities
+from app.valuation import mark_prices, refresh_valuations
+from datetime import date, datetime
+from decimal import Decimal
+from sqlalchemy import func
+import numpy as np
+import re
+
+PRICE_CHUNK = 200           # tickers per batched price download
+CENT = Decimal("0.01")
+_TICKER_RE = re.compile(r"^[A-Z0-9^][A-Z0-9.^=-]{0,9}$")  # same 10-character limit as holdings
+
+
+# ---------------- Targets ----------------
+def validate_targets(rows):
+    """
+    Normalize (kind, key, weight) rows from the form. Weights are fractions;
+    whatever they leave below 1 stays in cash. Raises ValueError on bad input.
+    """
+    cleaned = {}
+    for kind, key, weight in rows:
+        key = (key or "").strip()
+        if not key:
+            continue
+        if kind not in ("ticker", "sector"):
+            raise ValueError(f"Unknown target type: {kind}")
+        if kind == "ticker":
+            key = key.upper()
+            if not _TICKER_RE.match(key):
+                raise ValueError(f"Invalid ticker: {key[:20]}")
+        elif len(key) > 50:
+            raise ValueError(f"Sector name too long: {key[:20]}...")
+        if not 0 < weight <= 1:
+            raise ValueError(f"Weight for {key} must be between 0% and 100%")
+        cleaned[(kind, key)] = weight
+    if sum(cleaned.values()) > 1 + 1e-9:
+        raise ValueError("Target weights add up to more than 100%")
+    return [(kind, key, weight) for (kind, key), weight in cleaned.items()]
+
+
+def save_targets(user_id, rows):
+    """Replace a user's targets and drop any plan computed from the old ones."""
+    rows = validate_targets(rows)
+    TargetAllocation.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    RebalanceOrder.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    RebalanceRun.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(TargetAllocation, [
+        {"user_id": user_id, "kind": kind, "key": key, "weight": weight}
+        for kind, key, weight in rows
+    ])
+    ensure_securities([key for kind, key, _ in rows if kind == "ticker"])
+    db.session.commit()
+    return rows
+
+
+def resolve_weights(targets, values, sector_of):
+    """
+    Expand one user's targets into {ticker: weight}.
+    A sector weight is split over the user's holdings in that sector (those
+    without their own ticker target) in proportion to current value.
+    Returns (weights, unfilled_sectors); unfilled sector weight stays in cash.
+    """
+    weights = {key: w for kind, key, w in targets if kind == "ticker"}
+    unfilled = []
+    for kind, key, w in targets:
+        if kind != "sector":
+            continue
+        members = [t for t in values if sector_of.get(t) == key and t not in weights]
+        if not members:
+            unfilled.append(key)
+            continue
+        total = sum(values[t] for t in members)
+        for t in members:
+            weights[t] = w * (values[t] / total if total > 0 else 1.0 / len(members))
+    return weights, unfilled
+
+
+# ---------------- Solver ----------------
+def solve_shares(quantities, weights, prices, cash):
+    """
+    Whole-share targets for many users at once.
+    - quantities: (users x tickers) current shares
+    - weights: (users x tickers) target weights, each row summing to <= 1
+    - prices: (tickers,) prices; NaN columns are left untouched
+    - cash: (users,) cash balances
+    Rounds every target down, then buys one extra share of the positions
+    furthest below target while the total invested stays within what the
+    weights allot, so the cash the targets leave uninvested is never spent.
+    """
+    tradable = np.isfinite(prices) & (prices > 0)
+    p = np.where(tradable, prices, 1.0)
+    weights = np.where(tradable, weights, 0.0)
+
+    value = (quantities * tradable) @ p + cash
+    ideal = weights * value[:, None] / p
+    shares = np.floor(ideal)
+    remainder = ideal - shares
+    # Invested amount the weights allow beyond the rounded-down positions
+    budget = weights.sum(axis=1) * value - shares @ (p * tradable)
+
+    # Largest-remainder pass: cumulative cost of one more share, best first,
+    # only for positions still below target
+    order = np.argsort(-remainder, axis=1)
+    below = np.take_along_axis((weights > 0) & (remainder > 1e-9), order, axis=1)
+    step = np.where(below, p[order], 0.0)
+    extra = (np.cumsum(step, axis=1) <= budget[:, None] + 1e-9) & (step > 0)
+    bump = np.zeros_like(extra)
+    np.put_along_axis(bump, order, extra, axis=1)
+    shares += bump
+
+    return np.where(tradable, shares, quantities).astype(np.int64)
+
+
+def fetch_prices(tickers):
+    """Latest prices for many tickers, downloaded in chunks."""
+    tickers = sorted(tickers)
+    prices = {}
+    for start in range(0, len(tickers), PRICE_CHUNK):
+        prices.update(latest_prices(tickers[start:start + PRICE_CHUNK]))
+    return prices
+
+
+# ---------------- Planning ----------------
+def _plan_batch(user_ids, prices=None):
+    """
+    Plans for a batch of users with one solve over a (users x tickers) matrix.
+    Held tickers with no ticker or sector target get weight 0 and are sold;
+    they are listed under "untargeted" so the plan says so.
+    Returns {user_id: {"orders": [...], "unfilled": [...], "missing": [...],
+    "untargeted": [...], "cash_after": Decimal}}.
+    """
+    targets = {}
+    for t in TargetAllocation.query.filter(TargetAllocation.user_id.in_(user_ids)):
+        targets.setdefault(t.user_id, []).append((t.kind, t.key, t.weight))
+    user_ids = [u for u in user_ids if u in targets]
+    if not user_ids:
+        return {}
+
+    positions, sector_of = {}, {}
+    rows = (db.session.query(Holding.user_id, Holding.ticker, Holding.quantity,
+                             func.coalesce(Security.sector, Holding.sector))
+            .outerjoin(Security, Security.ticker == Holding.ticker)
+            .filter(Holding.user_id.in_(user_ids)))
+    for user_id, ticker, quantity, sector in rows:
+        pos = positions.setdefault(user_id, {})
+        pos[ticker.upper()] = pos.get(ticker.upper(), 0) + quantity
+        if sector:
+            sector_of[ticker.upper()] = sector
+    cash = {p.user_id: Decimal(p.cash_balance) for p in
+            Portfolio.query.filter(Portfolio.user_id.in_(user_ids))}
+
+    universe = set()
+    for user_id in user_ids:
+        universe.update(positions.get(user_id, {}))
+        universe.update(key for kind, key, _ in targets[user_id] if kind == "ticker")
+    if prices is None:
+        prices = fetch_prices(universe)
+    # Trade at cent prices so stored orders add up exactly
+    prices = {t: Decimal(str(prices[t])).quantize(CENT) for t in universe if t in prices}
+
+    tickers = sorted(universe)
+    column = {t: j for j, t in enumerate(tickers)}
+    price_vec = np.array([float(prices[t]) if t in prices else np.nan for t in tickers])
+    quantities = np.zeros((len(user_ids), len(tickers)))
+    weights = np.zeros_like(quantities)
+    cash_vec = np.array([float(cash.get(u, 0)) for u in user_ids])
+
+    unfilled, untargeted = {}, {}
+    for i, user_id in enumerate(user_ids):
+        pos = positions.get(user_id, {})
+        for t, q in pos.items():
+            quantities[i, column[t]] = q
+        values = {t: q * float(prices[t]) for t, q in pos.items() if t in prices}
+        w, unfilled[user_id] = resolve_weights(targets[user_id], values, sector_of)
+        untargeted[user_id] = sorted(t for t in values if t not in w)
+        for t, wt in w.items():
+            weights[i, column[t]] = wt
+
+    shares = solve_shares(quantities, weights, price_vec, cash_vec)
+    delta = shares - quantities.astype(np.int64)
+
+    plans = {}
+    for i, user_id in enumerate(user_ids):
+        orders = []
+        for j in np.flatnonzero(delta[i]):
+            qty = int(delta[i, j])
+            orders.append({"ticker": tickers[j], "side": "buy" if qty > 0 else "sell",
+                           "quantity": abs(qty), "price": prices[tickers[j]]})
+        orders.sort(key=lambda o: (o["side"] != "sell", o["ticker"]))  # sells fund the buys
+        flow = sum((o["price"] * o["quantity"] * (1 if o["side"] == "sell" else -1) for o in orders), Decimal("0"))
+        plans[user_id] = {
+            "orders": orders,
+            "unfilled": unfilled[user_id],
+            "missing": [t for t in tickers if t not in prices
+                        and (quantities[i, column[t]] or weights[i, column[t]])],
+            "untargeted": untargeted[user_id],
+            "cash_after": cash.get(user_id, Decimal("0")) + flow,
+        }
+    return plans
+
+
+def plan_rebalance(user_id):
+    """Live plan for one user at current prices (None without targets)."""
+    return _plan_batch([user_id]).get(user_id)
+
+
+def _store_orders(plans, run_date):
+    """
+    Replace the given users' stored orders for `run_date` with a bulk insert,
+    plus one run row per user carrying the plan's notes.
+    """
+    if not plans:
+        return
+    for model in (RebalanceOrder, RebalanceRun):
+        model.query.filter(
+            model.run_date == run_date,
+            model.user_id.in_(list(plans)),
+        ).delete(synchronize_session=False)
+    now = datetime.utcnow()
+    db.session.bulk_insert_mappings(RebalanceOrder, [
+        dict(user_id=user_id, run_date=run_date, created_at=now, **order)
+        for user_id, plan in plans.items() for order in plan["orders"]
+    ])
+    db.session.bulk_insert_mappings(RebalanceRun, [
+        dict(user_id=user_id, run_date=run_date, created_at=now,
+             notes={k: plan[k] for k in ("unfilled", "missing", "untargeted")})
+        for user_id, plan in plans.items()
+    ])
+    db.session.commit()
+
+
+def rebalance_all_users(batch_size=1000):
+    """
+    Nightly batch: plan orders for every user with targets.
+    Prices for the whole user base are downloaded once up front, then users
+    are solved a batch at a time. Returns the number of users planned.
+    """
+    run_date = date.today()
+    user_ids = [u for (u,) in db.session.query(TargetAllocation.user_id).distinct().order_by(TargetAllocation.user_id)]
+    universe = {t.upper() for (t,) in db.session.query(Holding.ticker)
+                .filter(Holding.user_id.in_(db.session.query(TargetAllocation.user_id))).distinct()}
+    universe |= {k for (k,) in db.session.query(TargetAllocation.key).filter_by(kind="ticker").distinct()}
+    prices = fetch_prices(universe)
+
+    total = 0
+    for start in range(0, len(user_ids), batch_size):
+        plans = _plan_batch(user_ids[start:start + batch_size], prices)
+        _store_orders(plans, run_date)
+        total += len(plans)
+    return total
+
+
+def stored_plan(user_id):
+    """
+    Today's nightly plan for the user without touching the price feed, or
+    None when there is none or the user has traded since it was planned.
+    """
+    run = RebalanceRun.query.filter_by(user_id=user_id, run_date=date.today()).first()
+    if run is None:
+        return None
+    planned_at = run.created_at
+    traded_since = db.session.query(Trade.trade_id).filter(
+        Trade.user_id == user_id, Trade.executed_at > planned_at).first()
+    if traded_since:
+        return None
+
+    portfolio = Portfolio.query.filter_by(user_id=user_id).first()
+    orders = RebalanceOrder.query.filter_by(user_id=user_id, run_date=run.run_date)
+    orders = sorted(({"ticker": o.ticker, "side": o.side, "quantity": o.quantity, "price": o.price}
+                     for o in orders), key=lambda o: (o["side"] != "sell", o["ticker"]))
+    flow = sum((o["price"] * o["quantity"] * (1 if o["side"] == "sell" else -1) for o in orders), Decimal("0"))
+    return {
+        "orders": orders,
+        "unfilled": run.notes.get("unfilled", []),
+        "missing": run.notes.get("missing", []),
+        "untargeted": run.notes.get("untargeted", []),
+        "cash_after": (Decimal(portfolio.cash_balance) if portfolio else Decimal("0")) + flow,
+        "planned_at": planned_at,
+    }
+
+
+# ---------------- Execution ----------------
+def apply_rebalance(user_id):
+    """
+    Re-plan at current prices and execute: sells first, then buys, through
+    the trade ledger. Returns the executed orders.
+    """
+    plan = plan_rebalance(user_id)
+    if not plan or not plan["orders"]:
+        return []
+    if plan["cash_after"] < 0:
+        raise ValueError("Insufficient cash to rebalance")
+
+    portfolio = Portfolio.query.filter_by(user_id=user_id).first()
+    if not portfolio:
+        portfolio = Portfolio(user_id=user_id, cash_balance=0, total_invested=0)
+        db.session.add(portfolio)
+    # Bring every holder of the traded tickers to the execution prices
+    mark_prices({o["ticker"]: o["price"] for o in plan["orders"]})
+    holdings = {h.ticker.upper(): h for h in Holding.query.filter_by(user_id=user_id)}
+
+    record_trades(user_id, [(o["ticker"], o["side"], o["quantity"], o["price"]) for o in plan["orders"]])
+    for o in plan["orders"]:
+        amount = o["price"] * o["quantity"]
+        holding = holdings.get(o["ticker"])
+        if o["side"] == "sell":
+            portfolio.cash_balance += amount
+            portfolio.total_invested -= holding.purchase_price * o["quantity"]
+            holding.quantity -= o["quantity"]
+            if holding.quantity == 0:
+                db.session.delete(holding)
+        else:
+            portfolio.cash_balance -= amount
+            portfolio.total_invested += amount
+            if holding:
+                new_quantity = holding.quantity + o["quantity"]
+                holding.purchase_price = (holding.purchase_price * holding.quantity + amount) / new_quantity
+                holding.quantity = new_quantity
+            else:
+                holdings[o["ticker"]] = Holding(user_id=user_id, ticker=o["ticker"],
+                                                quantity=o["quantity"], purchase_price=o["price"])
+                db.session.add(holdings[o["ticker"]])
+
+    RebalanceOrder.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    refresh_valuations([user_id])
+    db.session.commit()
+    maybe_snapshot(user_id)
+    return plan["orders"]
@@ -0,0 +1,186 @@
+# app/recommend.py
+from flask import current_app
+from app.models import Holding
+from app.market_data import load_price_matrix
+from app.cache import DailyCache, TTLCache
+from app.market_hours import last_close
+from threading import Lock
+import glob
+import os
+import numpy as np
+import pandas as pd
+
+RETURN_WINDOW = "6mo"       # history used for the correlation matrix
+CHUNK_SIZE = 200            # tickers per batched download
+
+# Blend of the three ranking signals (sums to 1)
+DIVERSIFICATION_WEIGHT = 0.5
+SECTOR_WEIGHT = 0.3
+MOMENTUM_WEIGHT = 0.2
+
+FACTOR_TTL = 12 * 3600      # seconds the current session's factor is kept in memory
+FALLBACK_TTL = 5 * 60       # recheck disk this often while serving an older factor
+KEEP_FACTORS = 2            # factor files kept on disk (current plus one fallback)
+
+_factor_cache = TTLCache(maxsize=2)
+_matrix_cache = DailyCache(maxsize=4)
+_load_lock = Lock()
+
+
+# ---------------- Daily Correlation Factor ----------------
+def build_return_factor(tickers):
+    """
+    Standardized daily returns Z (days x tickers) for the universe, so that
+    the correlation matrix is Z.T @ Z / days. Storing Z instead of the full
+    tickers x tickers matrix keeps large universes small on disk and in memory.
+    """
+    frames = []
+    for start in range(0, len(tickers), CHUNK_SIZE):
+        dates, columns, prices = load_price_matrix(tickers[start:start + CHUNK_SIZE], period=RETURN_WINDOW)
+        if len(columns):
+            frames.append(pd.DataFrame(prices, index=dates, columns=columns))
+    if not frames:
+        return [], np.empty((0, 0), dtype=np.float32)
+
+    prices = pd.concat(frames, axis=1).sort_index().ffill().bfill()
+    returns = prices.to_numpy(dtype=float)
+    returns = returns[1:] / returns[:-1] - 1.0
+    stdev = returns.std(axis=0)
+    z = np.divide(returns - returns.mean(axis=0), stdev, out=np.zeros_like(returns), where=stdev > 0)
+    return list(prices.columns), z.astype(np.float32)
+
+
+def _factor_dir():
+    return os.path.join(current_app.instance_path, "recommend")
+
+
+def _factor_path(day):
+    return os.path.join(_factor_dir(), f"returns-{day.isoformat()}.npz")
+
+
+def precompute_return_factor(tickers):
+    """
+    Scheduler/CLI job: build the factor for the last close and share it with
+    every worker via disk. Requests never build it.
+    """
+    columns, z = build_return_factor(sorted(tickers))
+    path = _factor_path(last_close().date())
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, tickers=np.array(columns), z=z)
+    os.replace(tmp, path)
+    _factor_cache.set(path, (path, columns, z), FACTOR_TTL)
+    _prune_factors()
+    return len(columns)
+
+
+def _factor_paths():
+    """Factor files on disk, oldest first (ISO dates sort by name)."""
+    return sorted(p for p in glob.glob(os.path.join(_factor_dir(), "returns-*.npz"))
+                  if not p.endswith(".tmp.npz"))
+
+
+def _prune_factors(keep=KEEP_FACTORS):
+    for path in _factor_paths()[:-keep]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _newest_factor_path():
+    paths = _factor_paths()
+    return paths[-1] if paths else None
+
+
+def load_return_factor():
+    """
+    (path, tickers, Z) for the last close from memory or disk. Until the
+    nightly job has written it, the newest older factor is served instead;
+    with none on disk yet the factor is empty.
+    """
+    wanted = _factor_path(last_close().date())
+    cached = _factor_cache.get(wanted)
+    if cached is not None:
+        return cached
+    with _load_lock:
+        cached = _factor_cache.get(wanted)
+        if cached is not None:
+            return cached
+        path = wanted if os.path.exists(wanted) else _newest_factor_path()
+        if path is None:
+            factor = (None, [], np.empty((0, 0), dtype=np.float32))
+        else:
+            with np.load(path) as data:
+                factor = (path, [str(t) for t in data["tickers"]], data["z"])
+        return _factor_cache.set(wanted, factor, FACTOR_TTL if path == wanted else FALLBACK_TTL)
+
+
+def aligned_factor(index):
+    """Factor columns reordered to the screener index rows (zeros where missing)."""
+    path, columns, z = load_return_factor()
+    key = ("aligned", index.version, path)
+    cached = _matrix_cache.get(key)
+    if cached is not None:
+        return cached
+    aligned = np.zeros((z.shape[0], len(index.tickers)), dtype=np.float32)
+    has_data = np.zeros(len(index.tickers), dtype=bool)
+    for j, t in enumerate(columns):
+        i = index.row_of.get(t)
+        if i is not None:
+            aligned[:, i] = z[:, j]
+            has_data[i] = True
+    return _matrix_cache.set(key, (aligned, has_data))
+
+
+# ---------------- Scoring ----------------
+def recommendation_scores(index, holdings):
+    """
+    Score every universe row for one user (higher = better addition):
+    low correlation with current holdings, under-represented sector, momentum.
+    The correlation term is a single matrix-vector product over the universe.
+    """
+    n = len(index.tickers)
+    if n == 0:
+        return np.zeros(0)
+
+    # Current value weights of holdings that are part of the universe
+    weights = np.zeros(n)
+    for h in holdings:
+        i = index.row_of.get(h.ticker.upper())
+        if i is not None:
+            price = index.last_price[i] if np.isfinite(index.last_price[i]) else float(h.purchase_price)
+            weights[i] += price * h.quantity
+    total = weights.sum()
+
+    if total > 0:
+        weights /= total
+        z, has_data = aligned_factor(index)
+        # corr(candidate, portfolio) for every candidate at once: Z.T @ (Z @ w) / days
+        portfolio = z @ weights.astype(np.float32)
+        norm = np.linalg.norm(portfolio)
+        corr = (z.T @ portfolio) / (norm * np.sqrt(len(z))) if norm > 0 else np.zeros(n)
+        diversification = np.where(has_data, (1.0 - corr) / 2.0, 0.5)
+
+        sector_weight = np.bincount(index.sector_codes, weights=weights, minlength=len(index.sectors))
+        sector_gap = 1.0 - sector_weight[index.sector_codes]
+    else:
+        diversification = np.full(n, 0.5)
+        sector_gap = np.ones(n)
+
+    momentum = index.momentum_1m
+    spread = np.nanstd(momentum) if np.isfinite(momentum).any() else 0.0
+    if spread > 0:
+        mz = np.clip((momentum - np.nanmean(momentum)) / spread, -3, 3)
+        momentum_score = np.nan_to_num((mz + 3) / 6, nan=0.5)
+    else:
+        momentum_score = np.full(n, 0.5)
+
+    return (DIVERSIFICATION_WEIGHT * diversification
+            + SECTOR_WEIGHT * sector_gap
+            + MOMENTUM_WEIGHT * momentum_score)
+
+
+def recommend_for_user(user_id, index):
+    """Scores aligned with `index` rows for the given user."""
+    return recommendation_scores(index, Holding.query.filter_by(user_id=user_id).all())
@@ -0,0 +1,144 @@
+# app/routes/analytics.py
+from flask import Blueprint, render_template, session, redirect, url_for, request
+from app.models import Holding
+from app.market_data import load_price_matrix, shared_price_matrix
+from app.cache import DailyCache
+from app.projection import project_portfolio, HORIZONS, DEFAULT_HORIZON
+import numpy as np
+
+analytics_bp = Blueprint("analytics", __name__, template_folder="../templates")
+
+BENCHMARK_TICKER = "SPY"
+RISK_FREE_RATE = 0.04       # annual, used for Sharpe ratio
+TRADING_DAYS = 252
+MAX_CORR_DISPLAY = 25       # largest holdings shown in the correlation grid
+
+# Risk results keyed by (user_id, holdings signature), reset every trading day
+_risk_cache = DailyCache()
+
+
+# ---------------- Helper Functions ----------------
+def compute_risk_metrics(prices, quantities, benchmark):
+    """
+    Portfolio risk statistics from a (days x holdings) price matrix.
+    - prices: 2D array of closes, one column per holding
+    - quantities: 1D array of share counts aligned with the columns
+    - benchmark: 1D array of benchmark closes aligned with the rows
+    Everything is computed from one covariance matrix of daily returns.
+    """
+    values = prices * quantities
+    weights = values[-1] / values[-1].sum()
+
+    returns = prices[1:] / prices[:-1] - 1.0
+    bench_returns = benchmark[1:] / benchmark[:-1] - 1.0
+
+    # Joint covariance: holdings in the first n rows/cols, benchmark last
+    n = returns.shape[1]
+    cov = np.atleast_2d(np.cov(np.column_stack([returns, bench_returns]), rowvar=False))
+    asset_cov = cov[:n, :n]
+
+    port_var = float(weights @ asset_cov @ weights)
+    volatility = float(np.sqrt(port_var * TRADING_DAYS))
+
+    bench_var = float(cov[n, n])
+    beta = float(weights @ cov[:n, n] / bench_var) if bench_var > 0 else None
+
+    port_returns = returns @ weights
+    annual_return = float(port_returns.mean() * TRADING_DAYS)
+    sharpe = (annual_return - RISK_FREE_RATE) / volatility if volatility > 0 else None
+
+    # Buy-and-hold drawdown of the actual share counts
+    total = values.sum(axis=1)
+    drawdowns = total / np.maximum.accumulate(total) - 1.0
+    max_drawdown = float(drawdowns.min())
+
+    stdev = np.sqrt(np.diag(asset_cov))
+    denom = np.outer(stdev, stdev)
+    corr = np.divide(asset_cov, denom, out=np.zeros_like(asset_cov), where=denom > 0)
+    np.fill_diagonal(corr, 1.0)
+
+    return {
+        "weights": weights,
+        "asset_volatility": stdev * np.sqrt(TRADING_DAYS),
+        "volatility": volatility,
+        "annual_return": annual_return,
+        "max_drawdown": max_drawdown,
+        "beta": beta,
+        "sharpe": sharpe,
+        "correlation": corr,
+    }
+
+
+def portfolio_risk(user_id, load=None):
+    """
+    Risk report for a user's holdings, cached per user per trading day.
+    `load` stands in for load_price_matrix (see shared_price_matrix).
+    """
+    holdings = Holding.query.filter_by(user_id=user_id).all()
+    positions = {}
+    for h in holdings:
+        positions[h.ticker.upper()] = positions.get(h.ticker.upper(), 0) + h.quantity
+    positions = {t: q for t, q in positions.items() if q > 0}
+    if not positions:
+        return None
+
+    key = (user_id, tuple(sorted(positions.items())))
+    cached = _risk_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # One batched download for every holding plus the benchmark
+    dates, tickers, prices = (load or load_price_matrix)(list(positions) + [BENCHMARK_TICKER], period="1y")
+    if BENCHMARK_TICKER not in tickers or len(dates) < 3:
+        return None
+
+    bench_col = tickers.index(BENCHMARK_TICKER)
+    cols = [i for i, t in enumerate(tickers) if t in positions]
+    if not cols:
+        return None
+
+    held = [tickers[i] for i in cols]
+    quantities = np.array([positions[t] for t in held], dtype=float)
+    metrics = compute_risk_metrics(prices[:, cols], quantities, prices[:, bench_col])
+
+    order = np.argsort(-metrics["weights"])
+    rows = [{
+        "ticker": held[i],
+        "quantity": int(quantities[i]),
+        "weight": float(metrics["weights"][i]),
+        "volatility": float(metrics["asset_volatility"][i]),
+    } for i in order]
+
+    top = order[:MAX_CORR_DISPLAY]
+    report = {
+        "as_of": dates[-1].strftime("%m/%d/%Y"),
+        "benchmark": BENCHMARK_TICKER,
+        "volatility": metrics["volatility"],
+        "annual_return": metrics["annual_return"],
+        "max_drawdown": metrics["max_drawdown"],
+        "beta": metrics["beta"],
+        "sharpe": metrics["sharpe"],
+        "holdings": rows,
+        "missing": sorted(set(positions) - set(held)),
+        "corr_tickers": [held[i] for i in top],
+        "corr_matrix": metrics["correlation"][np.ix_(top, top)].round(2).tolist(),
+    }
+    return _risk_cache.set(key, report)
+
+
+# ---------------- Routes ----------------
+@analytics_bp.route("/analytics")
+def analytics():
+    if "user_id" not in session:
+        return redirect(url_for("auth.login_page"))
+
+    # Risk and projection both need the holdings' 1y closes; download them once
+    load = shared_price_matrix()
+    report = portfolio_risk(session["user_id"], load=load)
+
+    horizon = request.args.get("horizon", DEFAULT_HORIZON)
+    if horizon not in HORIZONS:
+        horizon = DEFAULT_HORIZON
+    projection = project_portfolio(session["user_id"], horizon, load=load)
+    return render_template("analytics.html", report=report, projection=projection,
+                           horizons=list(HORIZONS))
@@ -1,8 +1,11 @@
-from flask import Blueprint, render_template, redirect, url_for, session, request, flash
+from flask import Blueprint, render_template, redirect, url_for, session, request, flash, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_mail import Message
 from app import db, mail
-from app.models import User, Admin, Holding, Portfolio
+from app.models import User, Admin, Holding, Portfolio, PortfolioValuation
+from app.admission import admission_stats
+from app.valuation import live_total
+from sqlalchemy import func
 
 auth_bp = Blueprint("auth", __name__, template_folder="../templates")
 
@@ -104,23 +107,49 @@ def admin_dashboard():
         flash("Please log in as admin first.", "warning")
         return redirect(url_for("auth.admin_login_page"))
 
-    users = User.query.all()
-    user_data = []
+    # ?sort=value ranks by materialized market value plus live cash (no recomputation);
+    # cash moves outside the valuation paths, so the stored total_value can't be sorted on
+    sort = request.args.get("sort", "id")
+    query = User.query
+    if sort == "value":
+        total = (func.coalesce(PortfolioValuation.market_value, 0)
+                 + func.coalesce(Portfolio.cash_balance, 0))
+        query = (query.outerjoin(PortfolioValuation, PortfolioValuation.user_id == User.id)
+                 .outerjoin(Portfolio, Portfolio.user_id == User.id)
+                 .order_by(total.desc(), User.id))
+    users = query.order_by(User.id).all()
+
+    # One query per table instead of one per user
+    holdings, portfolios, valuations = {}, {}, {}
+    for h in Holding.query.order_by(Holding.ticker):
+        holdings.setdefault(h.user_id, []).append(h)
+    for p in Portfolio.query:
+        portfolios[p.user_id] = p
+    for v in PortfolioValuation.query:
+        valuations[v.user_id] = v
 
+    user_data = []
     for user in users:
-        holdings = Holding.query.filter_by(user_id=user.id).all()
-        portfolio = Portfolio.query.filter_by(user_id=user.id).first()
-
         user_data.append({
             "id": user.id,
             "name": user.name,
             "email": user.email,
             "blocked": user.blocked,
-            "holdings": holdings,
-            "portfolio": portfolio,
+            "holdings": holdings.get(user.id, []),
+            "portfolio": portfolios.get(user.id),
+            "value": (live_total(valuations[user.id], portfolios.get(user.id))
+                      if user.id in valuations else None),
         })
 
-    return render_template("admin_dashboard.html", users=user_data)
+    return render_template("admin_dashboard.html", users=user_data, sort=sort)
+
+
+@auth_bp.route("/admin/admission-stats")
+def admin_admission_stats():
+    """Queue depth and rejection counters of this worker, for tuning ADMISSION_LIMITS."""
+    if "admin_id" not in session:
+        return jsonify({"error": "admin login required"}), 403
+    return jsonify(admission_stats())
 
 
 # ---------------- ADMIN ACTIONS ----------------
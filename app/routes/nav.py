@@ -1,10 +1,12 @@
 # app/threshold.py
 from flask import Blueprint, render_template, session, redirect, url_for, request, flash
-from app.models import db, User, Threshold
-import yfinance as yf
+from app.models import db, User, Threshold, Holding, ThresholdSuggestion
+from app.backtest import latest_results
+from app.market_data import load_price_matrix, cached_history
+from app.market_hours import last_close
+from sqlalchemy.exc import IntegrityError
 import numpy as np
 from sklearn.linear_model import LogisticRegression
-from datetime import date, timedelta
 
 threshold_bp = Blueprint("threshold", __name__)
 
@@ -12,23 +14,31 @@ threshold_bp = Blueprint("threshold", __name__)
 def get_trend_data(ticker, days=30):
     """
     Return historical close prices as 1D numpy array for last `days`.
+    Served from the history cache, which follows the market-hours TTLs.
     """
-    try:
-        end_date = date.today()
-        start_date = end_date - timedelta(days=days)
-        data = yf.download(ticker, start=start_date, end=end_date, progress=False)
-        if data.empty:
-            return None
-        return np.array(data["Close"].values).flatten()
-    except Exception:
+    period = "1mo" if days <= 31 else "3mo" if days <= 92 else "1y"
+    series = cached_history([ticker], period=period).get(ticker.upper())
+    if series is None or series.empty:
         return None
+    cutoff = series.index[-1] - np.timedelta64(days, "D")
+    return series[series.index > cutoff].to_numpy(dtype=float)
+
+def suggestion_day():
+    """Suggestions are keyed by the last completed session, so they only change after a close."""
+    return last_close().date()
 
 def suggest_threshold(ticker):
     """
     Use logistic regression to suggest threshold.
     Returns None if insufficient data.
     """
-    prices = get_trend_data(ticker, days=30)
+    return suggest_from_prices(get_trend_data(ticker, days=30))
+
+def suggest_from_prices(prices):
+    """
+    Logistic-regression threshold for a 1D array of recent closes.
+    Returns None if insufficient data.
+    """
     if prices is None or len(prices) < 5:
         return None  # insufficient data
 
@@ -47,6 +57,67 @@ def suggest_threshold(ticker):
     except Exception:
         return None
 
+def store_suggestions(suggestions, day):
+    """
+    Persist {ticker: suggested} for `day`. Rows another worker already wrote
+    are kept, so concurrent misses for the same ticker are harmless. None
+    (failed download, too little data) is not stored, so it is retried.
+    """
+    suggestions = {t: v for t, v in suggestions.items() if v is not None}
+    if not suggestions:
+        return
+    try:
+        db.session.bulk_insert_mappings(ThresholdSuggestion, [
+            {"ticker": t, "trading_day": day, "suggested": v} for t, v in suggestions.items()
+        ])
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        for t, v in suggestions.items():
+            try:
+                db.session.add(ThresholdSuggestion(ticker=t, trading_day=day, suggested=v))
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+
+def cached_suggest_threshold(ticker):
+    """
+    Suggestion for `ticker` from the per-trading-day table.
+    A miss is computed once and stored for every other worker.
+    """
+    ticker = ticker.upper()
+    day = suggestion_day()
+    row = ThresholdSuggestion.query.filter_by(ticker=ticker, trading_day=day).first()
+    if row:
+        return float(row.suggested) if row.suggested is not None else None
+
+    suggested = suggest_threshold(ticker)
+    store_suggestions({ticker: suggested}, day)
+    return suggested
+
+def precompute_threshold_suggestions(chunk_size=200):
+    """
+    Bulk-compute today's suggestions for every ticker in Threshold or Holding.
+    Prices come from one batched download per chunk of tickers.
+    Returns the number of suggestions written.
+    """
+    day = suggestion_day()
+    tickers = {t.upper() for (t,) in db.session.query(Threshold.ticker).distinct()}
+    tickers |= {t.upper() for (t,) in db.session.query(Holding.ticker).distinct()}
+    done = {t for (t,) in db.session.query(ThresholdSuggestion.ticker).filter_by(trading_day=day)}
+    pending = sorted(tickers - done)
+
+    written = 0
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        _, columns, prices = load_price_matrix(chunk, period="1mo")
+        found = {t: prices[:, i] for i, t in enumerate(columns)}
+        suggestions = {t: suggest_from_prices(found.get(t)) for t in chunk}
+        suggestions = {t: v for t, v in suggestions.items() if v is not None}
+        store_suggestions(suggestions, day)
+        written += len(suggestions)
+    return written
+
 def compute_trend_strength(ticker):
     """
     Lightweight metric for 'strength' used by 'switch_best' strategy.
@@ -117,11 +188,15 @@ def thresholds():
     thresholds_enabled = [t for t in thresholds if t.min_price is not None]
     thresholds_disabled = [t for t in thresholds if t.min_price is None]
 
+    # How each fallback strategy would have done over the last year
+    backtest = latest_results(user)
+
     return render_template(
         "nav.html",
         user=user,
         thresholds_enabled=thresholds_enabled,
-        thresholds_disabled=thresholds_disabled
+        thresholds_disabled=thresholds_disabled,
+        backtest=backtest
     )
 
 @threshold_bp.route("/thresholds/update/<ticker>", methods=["GET", "POST"])
@@ -134,7 +209,7 @@ def update_threshold_page(ticker):
     threshold = Threshold.query.filter_by(user_id=user_id, ticker=ticker.upper()).first()
     current_value = threshold.min_price if threshold else None
 
-    suggested = suggest_threshold(ticker)
+    suggested = cached_suggest_threshold(ticker)
 
     if request.method == "POST":
         new_value = request.form.get("threshold")
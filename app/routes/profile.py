@@ -1,11 +1,17 @@
 # profile_routes.py
 
-from flask import Blueprint, session, render_template, redirect, url_for, request
-from app.models import User, Portfolio, Holding, PortfolioHistory
+from flask import Blueprint, session, render_template, redirect, url_for, request, flash, jsonify, Response, stream_with_context
+from app.models import User, Portfolio, Holding, PortfolioHistory, Security
+from app.market_data import cached_latest_prices, cached_history
+from app.ledger import record_trade, record_trades, maybe_snapshot, positions_at
+from app.intraday import record_value, value_series
+from app.securities import ensure_securities, holdings_with_metadata
+from app.valuation import mark_prices, apply_position_change, refresh_valuations, get_valuation, live_total
 from app import db
-from decimal import Decimal
-import yfinance as yf
-from datetime import date
+from decimal import Decimal, InvalidOperation
+from datetime import date, datetime, timedelta
+import csv
+import io
 
 profile_bp = Blueprint("profile", __name__, template_folder="../templates")
 
@@ -13,24 +19,12 @@ profile_bp = Blueprint("profile", __name__, template_folder="../templates")
 # ----------------- Portfolio Calculation & Logging -----------------
 
 def calculate_live_portfolio_value(user_id):
-    """Calculate total portfolio value including cash and holdings."""
+    """
+    Total portfolio value including cash and holdings: the materialized
+    market value that price ticks and trades keep current, plus live cash.
+    """
     portfolio = Portfolio.query.filter_by(user_id=user_id).first()
-    cash_balance = Decimal(portfolio.cash_balance) if portfolio else Decimal('0.00')
-
-    holdings = Holding.query.filter_by(user_id=user_id).all()
-    holdings_value = Decimal('0.00')
-
-    for h in holdings:
-        try:
-            stock = yf.Ticker(h.ticker)
-            current_price = stock.history(period="1d")['Close'][-1]
-            current_price = Decimal(str(current_price))
-            holdings_value += current_price * h.quantity
-        except Exception as e:
-            print(f"Error fetching {h.ticker}: {e}")
-
-    total_value = cash_balance + holdings_value
-    return total_value.quantize(Decimal('0.01'))
+    return live_total(get_valuation(user_id), portfolio)
 
 
 def log_daily_portfolio_snapshot(user_id):
@@ -48,6 +42,8 @@ def log_daily_portfolio_snapshot(user_id):
         )
         db.session.add(snapshot)
 
+    # Same valuation feeds the intraday series (minute/hour/day tiers)
+    record_value(user_id, total_value)
     db.session.commit()
 
 
@@ -69,29 +65,31 @@ def profile():
     cash_balance = Decimal(portfolio.cash_balance).quantize(Decimal('0.01')) if portfolio else Decimal('0.00')
     total_invested = Decimal(portfolio.total_invested).quantize(Decimal('0.01')) if portfolio else Decimal('0.00')
 
-    # Fetch all holdings
-    holdings = Holding.query.filter_by(user_id=user.id).all()
+    # Fetch all holdings with name and sector from the security master
+    rows = holdings_with_metadata(user.id)
+    holdings = [h for h, _, _ in rows]
     holdings_list = []
-    total_holdings_value = Decimal('0.00')
 
-    for h in holdings:
-        try:
-            stock = yf.Ticker(h.ticker)
-            current_price = Decimal(str(stock.history(period="1d")['Close'][-1])).quantize(Decimal('0.01'))
-            holding_value = (current_price * h.quantity).quantize(Decimal('0.01'))
-            total_holdings_value += holding_value
-
-            holdings_list.append({
-                "ticker": h.ticker,
-                "quantity": h.quantity,
-                "current_price": current_price,
-                "holding_value": holding_value,
-                "sector": h.sector or "Unknown"
-            })
-        except Exception as e:
-            print(f"Error fetching {h.ticker}: {e}")
-
-    total_portfolio_value = (cash_balance + total_holdings_value).quantize(Decimal('0.01'))
+    prices = cached_latest_prices([h.ticker for h in holdings])
+    for h, name, sector in rows:
+        if h.ticker.upper() not in prices:
+            print(f"Error fetching {h.ticker}: no price data")
+            continue
+        current_price = Decimal(str(prices[h.ticker.upper()])).quantize(Decimal('0.01'))
+        holding_value = (current_price * h.quantity).quantize(Decimal('0.01'))
+
+        holdings_list.append({
+            "ticker": h.ticker,
+            "name": name,
+            "quantity": h.quantity,
+            "current_price": current_price,
+            "holding_value": holding_value,
+            "sector": sector
+        })
+
+    # Read-only: prices are marked by the scheduler and the trade paths
+    valuation = get_valuation(user.id)
+    total_portfolio_value = live_total(valuation, portfolio)
 
     # --- Log or update daily snapshot ---
     log_daily_portfolio_snapshot(user.id)
@@ -101,30 +99,24 @@ def profile():
     portfolio_history_dates = [h.date.strftime("%m/%d") for h in history]
     portfolio_history_values = [float(h.total_value) for h in history]
 
-    # --- Asset allocation (for pie chart) ---
-    asset_labels = []
-    asset_values = []
-
-    if holdings_list:
-        sector_map = {}
-        for h in holdings_list:
-            sector_map[h["sector"]] = sector_map.get(h["sector"], Decimal("0.00")) + h["holding_value"]
+    # --- Asset allocation (for pie chart), kept per sector on the valuation ---
+    allocation = sorted(((sector, float(value)) for sector, value in (valuation.sector_values or {}).items()),
+                        key=lambda item: item[1], reverse=True)
+    asset_labels = [sector for sector, _ in allocation]
+    asset_values = [value for _, value in allocation]
 
-        asset_labels = list(sector_map.keys())
-        asset_values = [float(v) for v in sector_map.values()]
-    
     # --- Weekly trend data for each holding ---
-        stock_trends = {}
-        for h in holdings:
-            try:
-                stock = yf.Ticker(h.ticker)
-                hist = stock.history(period="7d")["Close"]
-                stock_trends[h.ticker] = {
-                    "dates": [d.strftime("%m/%d") for d in hist.index],
-                    "prices": [float(p) for p in hist.values]
-                }
-            except Exception as e:
-                print(f"Error fetching trend for {h.ticker}: {e}")
+    stock_trends = {}
+    history_by_ticker = cached_history([h.ticker for h in holdings], period="7d")
+    for h in holdings:
+        hist = history_by_ticker.get(h.ticker.upper())
+        if hist is None:
+            print(f"Error fetching trend for {h.ticker}: no price data")
+            continue
+        stock_trends[h.ticker] = {
+            "dates": [d.strftime("%m/%d") for d in hist.index],
+            "prices": [float(p) for p in hist.values]
+        }
 
 
     # --- Render ---
@@ -166,11 +158,13 @@ def update_holding():
         db.session.commit()
 
     # Fetch current stock price
-    try:
-        stock_price = Decimal(str(yf.Ticker(ticker).history(period="1d")['Close'][-1])).quantize(Decimal('0.01'))
-    except Exception as e:
-        print(f"Error fetching {ticker}: {e}")
+    close = cached_latest_prices([ticker]).get(ticker)
+    if close is None:
+        print(f"Error fetching {ticker}: no price data")
         return redirect(url_for("profile.profile"))
+    stock_price = Decimal(str(close)).quantize(Decimal('0.01'))
+    # Re-mark existing shares first so the trade is valued at the same price
+    mark_prices({ticker: stock_price})
 
     holding = Holding.query.filter_by(user_id=user_id, ticker=ticker).first()
 
@@ -182,9 +176,12 @@ def update_holding():
             print("Insufficient funds")
             return redirect(url_for("profile.profile"))
 
+        record_trade(user_id, ticker, "buy", quantity, stock_price)
+
         # Deduct cash
         portfolio.cash_balance -= total_cost
         portfolio.total_invested += total_cost
+        apply_position_change(user_id, ticker, quantity, stock_price, portfolio)
 
         if holding:
             # Update average purchase price
@@ -207,17 +204,265 @@ def update_holding():
             print("Insufficient shares to sell")
             return redirect(url_for("profile.profile"))
 
+        record_trade(user_id, ticker, "sell", quantity, stock_price)
+
         total_proceeds = stock_price * quantity
         portfolio.cash_balance += total_proceeds
         portfolio.total_invested -= holding.purchase_price * quantity
+        apply_position_change(user_id, ticker, -quantity, stock_price, portfolio)
 
         holding.quantity -= quantity
         if holding.quantity == 0:
             db.session.delete(holding)
 
     db.session.commit()
+    maybe_snapshot(user_id)
 
     # Log/update daily portfolio snapshot after changes
     log_daily_portfolio_snapshot(user_id)
 
     return redirect(url_for("profile.profile"))
+
+
+
+# ----------------- Intraday Value Series -----------------
+
+SERIES_RANGES = {
+    "1d": timedelta(days=1),
+    "1w": timedelta(weeks=1),
+    "1m": timedelta(days=30),
+    "1y": timedelta(days=365),
+    "all": timedelta(days=365 * 10),
+}
+
+
+@profile_bp.route("/profile/value-series")
+def portfolio_value_series():
+    """Portfolio value chart data; the storage tier is picked from the range."""
+    user_id = session.get("user_id")
+    if not user_id:
+        return redirect(url_for("auth.login_page"))
+
+    span = SERIES_RANGES.get(request.args.get("range", "1d"), SERIES_RANGES["1d"])
+    tier, rows = value_series(user_id, datetime.utcnow() - span)
+    label = "%H:%M" if tier == "minute" else "%m/%d %H:%M" if tier == "hour" else "%m/%d/%y"
+    return jsonify({
+        "tier": tier,
+        "labels": [r.bucket_start.strftime(label) for r in rows],
+        "values": [float(r.value) for r in rows],
+        "low": [float(r.low) for r in rows],
+        "high": [float(r.high) for r in rows],
+    })
+
+
+# ----------------- Point-in-Time Holdings -----------------
+
+@profile_bp.route("/holdings/as-of")
+def holdings_as_of():
+    """What the user held at a given date (?date=YYYY-MM-DD, end of day)."""
+    user_id = session.get("user_id")
+    if not user_id:
+        return redirect(url_for("auth.login_page"))
+
+    try:
+        when = datetime.strptime(request.args.get("date", ""), "%Y-%m-%d").replace(hour=23, minute=59, second=59)
+    except ValueError:
+        return jsonify({"error": "date must be YYYY-MM-DD"}), 400
+
+    positions = positions_at(user_id, when)
+    master = {s.ticker: s for s in Security.query.filter(Security.ticker.in_(list(positions)))}
+    return jsonify({
+        "date": when.strftime("%Y-%m-%d"),
+        "holdings": [{
+            "ticker": t,
+            "name": master[t].name if t in master else t,
+            "sector": (master[t].sector if t in master else None) or "Unknown",
+            "quantity": p["quantity"],
+            "avg_price": float(p["avg_price"]),
+        } for t, p in positions.items()],
+    })
+
+
+# ----------------- Bulk Import / Export -----------------
+
+IMPORT_COLUMNS = ("ticker", "quantity", "purchase_price", "purchase_date", "sector")
+EXPORT_BATCH_SIZE = 500
+
+
+def parse_holdings_csv(stream):
+    """
+    Read a holdings CSV row by row and merge duplicate tickers.
+    Columns: ticker, quantity[, purchase_price][, purchase_date][, sector]
+    Returns ({ticker: row}, [error messages]); a file that can't be decoded
+    or parsed as CSV yields no rows at all.
+    """
+    try:
+        return _parse_holdings_rows(csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")))
+    except (UnicodeDecodeError, csv.Error) as e:
+        return {}, [f"Invalid file: not a UTF-8 CSV ({e.__class__.__name__})"]
+
+
+def _parse_holdings_rows(reader):
+    rows, errors = {}, []
+    for line_no, raw in enumerate(reader, start=2):
+        # DictReader collects fields beyond the header in a list under None
+        if None in raw:
+            errors.append(f"Line {line_no}: more fields than the header")
+            continue
+        raw = {(k or "").strip().lower(): (v or "").strip() for k, v in raw.items()}
+        ticker = raw.get("ticker", "").upper()
+        try:
+            quantity = int(raw.get("quantity", ""))
+            price = Decimal(raw["purchase_price"]) if raw.get("purchase_price") else None
+            purchase_date = datetime.strptime(raw["purchase_date"], "%Y-%m-%d") if raw.get("purchase_date") else None
+        except (ValueError, InvalidOperation):
+            errors.append(f"Line {line_no}: invalid quantity, price or date")
+            continue
+        if not ticker or len(ticker) > 10 or quantity <= 0:
+            errors.append(f"Line {line_no}: invalid ticker or quantity")
+            continue
+        if price is not None and (not price.is_finite() or price <= 0):
+            errors.append(f"Line {line_no}: invalid purchase price")
+            continue
+
+        row = rows.get(ticker)
+        if row is None:
+            rows[ticker] = {"quantity": quantity, "price": price, "purchase_date": purchase_date,
+                            "sector": raw.get("sector", "")[:50] or None}
+        elif price is not None and row["price"] is not None:
+            # Weighted average when the same ticker appears more than once
+            total = row["price"] * row["quantity"] + price * quantity
+            row["quantity"] += quantity
+            row["price"] = total / row["quantity"]
+        else:
+            row["quantity"] += quantity
+            row["price"] = None
+    return rows, errors
+
+
+@profile_bp.route("/holdings/import", methods=["POST"])
+def import_holdings():
+    user_id = session.get("user_id")
+    if not user_id:
+        return redirect(url_for("auth.login_page"))
+
+    upload = request.files.get("file")
+    if not upload or not upload.filename:
+        flash("Please choose a CSV file to import.", "warning")
+        return redirect(url_for("profile.profile"))
+
+    rows, errors = parse_holdings_csv(upload.stream)
+    if not rows:
+        flash("No valid rows found in the file.", "danger")
+        for message in errors[:10]:
+            flash(message, "warning")
+        return redirect(url_for("profile.profile"))
+
+    # Validate every ticker with a single batched price lookup
+    prices = cached_latest_prices(list(rows))
+    unknown = sorted(set(rows) - set(prices))
+    if unknown:
+        errors.append(f"Unknown tickers skipped: {', '.join(unknown)}")
+
+    portfolio = Portfolio.query.filter_by(user_id=user_id).first()
+    if not portfolio:
+        portfolio = Portfolio(user_id=user_id, cash_balance=0, total_invested=0)
+        db.session.add(portfolio)
+
+    existing = {h.ticker: h for h in Holding.query.filter(
+        Holding.user_id == user_id, Holding.ticker.in_(list(prices))
+    )}
+
+    inserts, updates, trades = [], [], []
+    invested = Decimal("0.00")
+    for ticker, row in rows.items():
+        if ticker not in prices:
+            continue
+        price = (row["price"] or Decimal(str(prices[ticker]))).quantize(Decimal("0.01"))
+        cost = price * row["quantity"]
+        invested += cost
+        trades.append((ticker, "buy", row["quantity"], price))
+
+        holding = existing.get(ticker)
+        if holding:
+            new_quantity = holding.quantity + row["quantity"]
+            updates.append({
+                "holding_id": holding.holding_id,
+                "quantity": new_quantity,
+                "purchase_price": ((holding.purchase_price * holding.quantity + cost) / new_quantity).quantize(Decimal("0.01")),
+            })
+        else:
+            inserts.append({
+                "user_id": user_id,
+                "ticker": ticker,
+                "quantity": row["quantity"],
+                "purchase_price": price,
+                "purchase_date": row["purchase_date"] or datetime.utcnow(),
+                "sector": row["sector"],
+            })
+
+    record_trades(user_id, trades)
+    ensure_securities([t for t, _, _, _ in trades])
+    mark_prices({t: prices[t] for t, _, _, _ in trades})
+    db.session.bulk_insert_mappings(Holding, inserts)
+    db.session.bulk_update_mappings(Holding, updates)
+    portfolio.total_invested = Decimal(portfolio.total_invested or 0) + invested
+    refresh_valuations([user_id])
+    db.session.commit()
+    maybe_snapshot(user_id)
+
+    log_daily_portfolio_snapshot(user_id)
+
+    flash(f"Imported {len(inserts) + len(updates)} holdings.", "success")
+    for message in errors[:10]:
+        flash(message, "warning")
+    return redirect(url_for("profile.profile"))
+
+
+def _stream_csv(filename, header, rows):
+    """Stream an iterable of rows as a CSV download, one buffered line at a time."""
+    def generate():
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate(0)
+        yield buf.getvalue()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+@profile_bp.route("/holdings/export")
+def export_holdings():
+    user_id = session.get("user_id")
+    if not user_id:
+        return redirect(url_for("auth.login_page"))
+
+    query = (Holding.query.filter_by(user_id=user_id)
+             .order_by(Holding.ticker)
+             .yield_per(EXPORT_BATCH_SIZE))
+    rows = ((h.ticker, h.quantity, h.purchase_price, h.purchase_date.strftime("%Y-%m-%d"), h.sector or "")
+            for h in query)
+    return _stream_csv("holdings.csv", IMPORT_COLUMNS, rows)
+
+
+@profile_bp.route("/history/export")
+def export_history():
+    user_id = session.get("user_id")
+    if not user_id:
+        return redirect(url_for("auth.login_page"))
+
+    # Plain column tuples, fetched in batches, keep memory flat for multi-year exports
+    query = (db.session.query(PortfolioHistory.date, PortfolioHistory.total_value)
+             .filter(PortfolioHistory.user_id == user_id)
+             .order_by(PortfolioHistory.date)
+             .yield_per(EXPORT_BATCH_SIZE))
+    rows = ((d.strftime("%Y-%m-%d"), value) for d, value in query)
+    return _stream_csv("portfolio_history.csv", ("date", "total_value"), rows)
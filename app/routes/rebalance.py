@@ -0,0 +1,71 @@
+# app/routes/rebalance.py
+from flask import Blueprint, render_template, session, redirect, url_for, request, flash
+from app.models import TargetAllocation
+from app.rebalance import save_targets, stored_plan, apply_rebalance
+from app.routes.profile import log_daily_portfolio_snapshot
+
+rebalance_bp = Blueprint("rebalance", __name__, template_folder="../templates")
+
+MAX_TARGET_ROWS = 20
+
+
+# ---------------- Routes ----------------
+@rebalance_bp.route("/rebalance")
+def rebalance():
+    if "user_id" not in session:
+        return redirect(url_for("auth.login_page"))
+    user_id = session["user_id"]
+
+    targets = TargetAllocation.query.filter_by(user_id=user_id).order_by(
+        TargetAllocation.kind.desc(), TargetAllocation.weight.desc()).all()
+
+    # Only the nightly plan is shown; page views never hit the price feed
+    plan = stored_plan(user_id) if targets else None
+    return render_template("rebalance.html", targets=targets, plan=plan, max_rows=MAX_TARGET_ROWS)
+
+
+@rebalance_bp.route("/rebalance/targets", methods=["POST"])
+def update_targets():
+    if "user_id" not in session:
+        return redirect(url_for("auth.login_page"))
+
+    rows = []
+    for kind, key, weight in zip(request.form.getlist("kind"),
+                                 request.form.getlist("key"),
+                                 request.form.getlist("weight")):
+        if not key.strip():
+            continue
+        try:
+            rows.append((kind, key, float(weight) / 100))
+        except ValueError:
+            flash(f"Invalid weight for {key}.", "danger")
+            return redirect(url_for("rebalance.rebalance"))
+
+    try:
+        saved = save_targets(session["user_id"], rows)
+    except ValueError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("rebalance.rebalance"))
+
+    flash(f"Saved {len(saved)} targets.", "success")
+    return redirect(url_for("rebalance.rebalance"))
+
+
+@rebalance_bp.route("/rebalance/apply", methods=["POST"])
+def apply():
+    if "user_id" not in session:
+        return redirect(url_for("auth.login_page"))
+    user_id = session["user_id"]
+
+    try:
+        executed = apply_rebalance(user_id)
+    except ValueError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("rebalance.rebalance"))
+
+    if executed:
+        log_daily_portfolio_snapshot(user_id)
+        flash(f"Executed {len(executed)} rebalancing orders.", "success")
+    else:
+        flash("Portfolio already matches its targets.", "info")
+    return redirect(url_for("rebalance.rebalance"))
@@ -1,17 +1,15 @@
-from flask import Blueprint, render_template, session, redirect
-from app.models import db, Holding
-import yfinance as yf
-import matplotlib
-matplotlib.use('Agg')  # Non-GUI backend
-import matplotlib.pyplot as plt
-from io import BytesIO
-import base64
+from flask import Blueprint, render_template, session, redirect, request
+from app.models import Holding
+from app.screener import get_screener_index, SORTS
+from app.recommend import recommendation_scores
+from app.sparkline import render_sparkline
 import numpy as np
-from sklearn.linear_model import LinearRegression
 
 stocks_bp = Blueprint("stocks", __name__)
 
-# Example top stocks list
+PER_PAGE = 12
+
+# Seed universe, loaded at startup until the securities table has reference data
 TOP_STOCKS = [
     # ---------- Technology ----------
     {"ticker": "AAPL", "name": "Apple Inc.", "sector": "Technology",
@@ -117,38 +115,18 @@ TOP_STOCKS = [
 ]
 
 
-def fetch_stock_trend(ticker):
-    """Fetch last 7 days and compute trend, return base64 image and trend text."""
-    try:
-        data = yf.download(ticker, period="7d", progress=False, auto_adjust=True)
-        if data.empty:
-            return None, "No data"
-
-        # Linear regression trend
-        X = np.arange(len(data)).reshape(-1, 1)
-        y = data["Close"].values.reshape(-1, 1)
-        model = LinearRegression().fit(X, y)
-        slope = model.coef_[0][0]
-        trend_text = "📈 Uptrend" if slope > 0 else "📉 Downtrend"
+def render_trend(closes):
+    """Compute trend from a sequence of closes, return inline SVG sparkline and trend text."""
+    closes = np.asarray(closes, dtype=float).flatten()
+    if len(closes) < 2:
+        return None, "No data"
 
-        # Plot trend graph
-        plt.figure(figsize=(3, 1.5))
-        plt.plot(data['Close'], color='green' if data['Close'].iloc[-1] >= data['Close'].iloc[0] else 'red')
-        plt.xticks([], [])
-        plt.yticks([], [])
-        plt.tight_layout()
+    # Least-squares linear trend
+    slope = np.polyfit(np.arange(len(closes)), closes, 1)[0]
+    trend_text = "📈 Uptrend" if slope > 0 else "📉 Downtrend"
 
-        buf = BytesIO()
-        plt.savefig(buf, format='png', transparent=True)
-        buf.seek(0)
-        img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-        plt.close()
+    return render_sparkline(closes), trend_text
 
-        return img_base64, trend_text
-
-    except Exception as e:
-        print(f"Error fetching {ticker}: {e}")
-        return None, "Error"
 
 @stocks_bp.route("/top-stocks")
 def top_stocks():
@@ -156,27 +134,45 @@ def top_stocks():
         return redirect("/login")
 
     user_id = session["user_id"]
-    user_stocks = [s.ticker for s in Holding.query.filter_by(user_id=user_id).all()]
+    holdings = Holding.query.filter_by(user_id=user_id).all()
+    user_stocks = {h.ticker.upper() for h in holdings}
+
+    query = request.args.get("q", "").strip()
+    sector = request.args.get("sector") or None
+    sort = request.args.get("sort", "recommended")
+    if sort not in SORTS:
+        sort = "recommended"
+    page = max(request.args.get("page", 1, type=int), 1)
+
+    # Served entirely from the in-memory index: no upstream calls per request
+    index = get_screener_index()
+    scores = recommendation_scores(index, holdings) if sort == "recommended" else None
+    results, total = index.search(query, sector=sector, sort=sort, page=page,
+                                  per_page=PER_PAGE, exclude=user_stocks, scores=scores)
 
     top_stocks_data = []
-
-    for stock in TOP_STOCKS:
-        if stock["ticker"] in user_stocks:
-            continue  # skip stocks already owned
-
-        trend_graph, trend_text = fetch_stock_trend(stock["ticker"])
-
-        # You can fetch logos from Yahoo Finance or use a placeholder
-       
-
+    for stock in results:
+        trend_graph, trend_text = (render_trend(stock["recent_closes"])
+                                   if stock["recent_closes"] else (None, "No data"))
         top_stocks_data.append({
             "ticker": stock["ticker"],
             "name": stock["name"],
             "sector": stock["sector"],
             "description": stock["description"],
+            "momentum": stock["momentum_1m"],
             "trend": trend_text,
             "trend_graph": trend_graph,
             "logo": stock["logo"]
         })
 
-    return render_template("top_stocks.html", stocks=top_stocks_data)
+    return render_template(
+        "top_stocks.html",
+        stocks=top_stocks_data,
+        sectors=index.sectors,
+        query=query,
+        sector=sector,
+        sort=sort,
+        page=page,
+        pages=max((total + PER_PAGE - 1) // PER_PAGE, 1),
+        total=total
+    )
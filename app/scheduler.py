@@ -0,0 +1,187 @@
+# app/scheduler.py
+from flask import current_app
+from app import db
+from app.models import Holding, Threshold, Security, Portfolio, PortfolioValuation
+from app.market_data import cached_latest_prices
+from app.market_hours import (session_at, poll_interval, next_open, last_close,
+                              eod_due_at, now_local)
+from app.intraday import record_value
+from app.valuation import mark_prices, live_total
+from datetime import datetime
+import json
+import os
+import time
+
+MAX_SLEEP = 15 * 60         # wake at least this often so config/calendar changes are picked up
+STATE_FILE = "scheduler.json"
+
+
+# ---------------- Jobs ----------------
+def _job_universe_refresh():
+    from app.screener import refresh_universe_metrics
+    return refresh_universe_metrics()
+
+
+def _job_precompute_suggestions():
+    from app.routes.nav import precompute_threshold_suggestions
+    return precompute_threshold_suggestions()
+
+
+def _job_recommend_precompute():
+    from app.recommend import precompute_return_factor
+    return precompute_return_factor([t for (t,) in db.session.query(Security.ticker)])
+
+
+def _job_backtest_all():
+    from app.backtest import backtest_all_users
+    return backtest_all_users()
+
+
+def _job_rebalance_all():
+    from app.rebalance import rebalance_all_users
+    return rebalance_all_users()
+
+
+def _job_compact_ledger():
+    from app.ledger import compact_all_snapshots
+    return compact_all_snapshots()
+
+
+def _job_intraday_retention():
+    from app.intraday import apply_retention
+    return apply_retention()
+
+
+def _job_news_refresh():
+    from app.news_archive import refresh_archive
+    return refresh_archive()
+
+
+def _job_securities_refresh():
+    from app.securities import refresh_security_metadata
+    return refresh_security_metadata()
+
+
+# Run in order once per trading day after the close; prices come first
+EOD_JOBS = (
+    ("universe-refresh", _job_universe_refresh),
+    ("precompute-suggestions", _job_precompute_suggestions),
+    ("recommend-precompute", _job_recommend_precompute),
+    ("backtest-all", _job_backtest_all),
+    ("rebalance-all", _job_rebalance_all),
+    ("compact-ledger", _job_compact_ledger),
+    ("intraday-retention", _job_intraday_retention),
+    ("news-refresh", _job_news_refresh),
+    ("securities-refresh", _job_securities_refresh),
+)
+
+
+def poll_prices():
+    """
+    One price poll during a session: refresh quotes for every held or watched
+    ticker in one batched request, apply them as a price tick and record the
+    value of every portfolio the tick moved in the intraday series.
+    Returns the number of tickers priced.
+    """
+    tickers = {t.upper() for (t,) in db.session.query(Holding.ticker).distinct()}
+    tickers |= {t.upper() for (t,) in db.session.query(Threshold.ticker).distinct()}
+    if not tickers:
+        return 0
+    prices = cached_latest_prices(tickers)
+    affected = sorted(mark_prices(prices))
+    db.session.commit()
+
+    # Only portfolios whose value changed get a new point
+    now = datetime.utcnow()
+    for start in range(0, len(affected), 1000):
+        batch = affected[start:start + 1000]
+        portfolios = {p.user_id: p for p in Portfolio.query.filter(Portfolio.user_id.in_(batch))}
+        for valuation in PortfolioValuation.query.filter(PortfolioValuation.user_id.in_(batch)).all():
+            record_value(valuation.user_id, live_total(valuation, portfolios.get(valuation.user_id)), now)
+    db.session.commit()
+    return len(prices)
+
+
+# ---------------- Scheduler ----------------
+class MarketScheduler:
+    """
+    Drives price polling and end-of-day jobs from the exchange calendar:
+    fast polls during the regular session, slow ones in extended hours,
+    nothing overnight or on weekends and holidays, and the EOD batch once
+    per trading day after the close. Run one per deployment.
+    """
+
+    def __init__(self, app, clock=datetime.utcnow, sleep=time.sleep):
+        self.app = app
+        self.clock = clock
+        self.sleep = sleep
+        self.state_path = os.path.join(app.instance_path, STATE_FILE)
+        self.last_poll = None
+
+    # --- persisted state (last EOD run survives restarts) ---
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+
+    def run_eod(self, day):
+        """Run every EOD job for `day`; a failing job is logged and the rest still run."""
+        results = {}
+        for name, job in EOD_JOBS:
+            started = time.perf_counter()
+            try:
+                results[name] = job()
+                current_app.logger.info("EOD %s %s: %s (%.1fs)", day, name, results[name],
+                                        time.perf_counter() - started)
+            except Exception:
+                db.session.rollback()
+                results[name] = None
+                current_app.logger.exception("EOD %s %s failed", day, name)
+        state = self._load_state()
+        state["eod"] = day.isoformat()
+        self._save_state(state)
+        return results
+
+    def tick(self):
+        """Do whatever is due now and return how many seconds to sleep."""
+        now = self.clock()
+        waits = [MAX_SLEEP]
+
+        interval = poll_interval(now)
+        if interval:
+            if self.last_poll is None or (now - self.last_poll).total_seconds() >= interval:
+                self.last_poll = now
+                try:
+                    poll_prices()
+                except Exception:
+                    db.session.rollback()
+                    current_app.logger.exception("Price poll failed")
+            waits.append(interval - (now - self.last_poll).total_seconds())
+        else:
+            waits.append((next_open(now) - now_local(now)).total_seconds())
+
+        day = last_close(now).date()
+        due = eod_due_at(day)
+        if self._load_state().get("eod", "") < day.isoformat():
+            if now_local(now) >= due:
+                self.run_eod(day)
+            else:
+                waits.append((due - now_local(now)).total_seconds())
+
+        current_app.logger.debug("Scheduler: %s session, sleeping %.0fs", session_at(now), min(waits))
+        return max(1.0, min(waits))
+
+    def run_forever(self):
+        with self.app.app_context():
+            while True:
+                self.sleep(self.tick())
+                db.session.remove()
@@ -0,0 +1,24 @@
+# app/schema.py
+from app import db
+from sqlalchemy import inspect
+
+
+def create_missing_indexes():
+    """
+    Add indexes declared on the models but absent from existing tables.
+    db.create_all() only creates missing tables, so an index added to a
+    model later never reaches a database created before it. Checked by
+    name, which works on MySQL (no CREATE INDEX IF NOT EXISTS) as well.
+    Returns the names of the indexes created.
+    """
+    inspector = inspect(db.engine)
+    created = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda ix: ix.name):
+            if index.name not in existing:
+                index.create(db.engine)
+                created.append(index.name)
+    return created
@@ -0,0 +1,234 @@
+# app/screener.py
+from app import db
+from app.models import Security
+from app.market_data import load_price_matrix
+from threading import Lock
+from datetime import datetime
+from sqlalchemy import func
+import csv
+import time
+import numpy as np
+
+INDEX_TTL = 60              # seconds between checks for a changed universe table
+TREND_POINTS = 7            # closes kept per ticker for the trend graph
+SORTS = ("recommended", "momentum", "momentum_3m", "ticker", "name")
+
+
+# ---------------- Universe Maintenance ----------------
+def load_universe(rows):
+    """
+    Bulk upsert security master rows (dicts with ticker, name, sector,
+    description, logo). Rows that come with a sector count as filled-in
+    reference data. Returns the number of rows written.
+    """
+    rows = [r for r in rows if r.get("ticker")]
+    if not rows:
+        return 0
+    existing = dict(db.session.query(Security.ticker, Security.sector))
+    inserts, updates = [], []
+    for r in rows:
+        record = {
+            "ticker": r["ticker"].strip().upper()[:10],
+            "name": (r.get("name") or r["ticker"]).strip()[:120],
+            "sector": (r.get("sector") or "").strip()[:50] or None,
+            "description": r.get("description") or None,
+            "logo": r.get("logo") or None,
+            "updated_at": datetime.utcnow(),
+            "screener_updated_at": datetime.utcnow(),
+        }
+        record["metadata_updated_at"] = datetime.utcnow() if record["sector"] else None
+        (updates if record["ticker"] in existing else inserts).append(record)
+        existing.setdefault(record["ticker"], record["sector"])
+    db.session.bulk_insert_mappings(Security, inserts)
+    db.session.bulk_update_mappings(Security, updates)
+
+    # Holders of re-classified tickers get their sector totals rebuilt
+    from app.valuation import refresh_holders
+    refresh_holders([r["ticker"] for r in updates if r["sector"] != existing[r["ticker"]]])
+    db.session.commit()
+    return len(inserts) + len(updates)
+
+
+def seed_universe(rows):
+    """
+    Load `rows` unless the table already holds reference data. Placeholder
+    rows written by trades (ticker only, no sector) don't count as seeded.
+    Returns the number of rows written.
+    """
+    if db.session.query(Security.ticker).filter(Security.sector.isnot(None)).first() is not None:
+        return 0
+    return load_universe(rows)
+
+
+def load_universe_csv(path):
+    """Load a universe CSV with ticker,name,sector[,description][,logo] columns."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return load_universe(csv.DictReader(f))
+
+
+def refresh_universe_metrics(chunk_size=200):
+    """
+    Recompute last price, momentum and recent closes for the whole universe.
+    Prices come from one batched download per chunk of tickers; new last
+    prices go through mark_prices so holders' valuations follow.
+    """
+    from app.valuation import mark_prices
+    tickers = [t for (t,) in db.session.query(Security.ticker).order_by(Security.ticker)]
+    updated = 0
+    for start in range(0, len(tickers), chunk_size):
+        _, columns, prices = load_price_matrix(tickers[start:start + chunk_size], period="3mo")
+        if len(columns) == 0 or len(prices) < 2:
+            continue
+        last = prices[-1]
+        month_ago = prices[max(len(prices) - 22, 0)]
+        mappings = [{
+            "ticker": t,
+            "momentum_1m": float(last[i] / month_ago[i] - 1.0),
+            "momentum_3m": float(last[i] / prices[0, i] - 1.0),
+            "recent_closes": [round(float(p), 4) for p in prices[-TREND_POINTS:, i]],
+            "updated_at": datetime.utcnow(),
+            "screener_updated_at": datetime.utcnow(),
+        } for i, t in enumerate(columns)]
+        db.session.bulk_update_mappings(Security, mappings)
+        mark_prices({t: round(float(last[i]), 2) for i, t in enumerate(columns)})
+        db.session.commit()
+        updated += len(mappings)
+    return updated
+
+
+# ---------------- In-Memory Index ----------------
+class PrefixTrie:
+    """Character trie mapping every prefix to the sorted row ids beneath it."""
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, word, row_id):
+        node = self.root
+        for ch in word:
+            node = node.setdefault(ch, {})
+            node.setdefault("_ids", set()).add(row_id)
+
+    def freeze(self):
+        """Convert id sets to NumPy arrays once all words are added."""
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            for key, child in node.items():
+                if key == "_ids":
+                    continue
+                child["_ids"] = np.fromiter(sorted(child["_ids"]), dtype=np.int64)
+                stack.append(child)
+
+    def lookup(self, prefix):
+        node = self.root
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return np.empty(0, dtype=np.int64)
+        return node.get("_ids", np.empty(0, dtype=np.int64))
+
+
+class ScreenerIndex:
+    """
+    Columnar, read-only snapshot of the universe table.
+    Searches run against the trie and NumPy columns without touching the DB.
+    """
+
+    def __init__(self, securities, version=None):
+        self.version = version
+        self.rows = [{
+            "ticker": s.ticker,
+            "name": s.name,
+            "sector": s.sector or "Other",
+            "description": s.description,
+            "logo": s.logo,
+            "last_price": float(s.last_price) if s.last_price is not None else None,
+            "momentum_1m": s.momentum_1m,
+            "momentum_3m": s.momentum_3m,
+            "recent_closes": s.recent_closes,
+        } for s in securities]
+
+        self.tickers = np.array([r["ticker"] for r in self.rows], dtype=object)
+        self.names = np.array([r["name"].lower() for r in self.rows], dtype=object)
+        self.sectors = sorted({r["sector"] for r in self.rows})
+        sector_code = {s: i for i, s in enumerate(self.sectors)}
+        self.sector_codes = np.array([sector_code[r["sector"]] for r in self.rows], dtype=np.int64)
+        self.momentum_1m = np.array([r["momentum_1m"] if r["momentum_1m"] is not None else np.nan
+                                     for r in self.rows], dtype=float)
+        self.momentum_3m = np.array([r["momentum_3m"] if r["momentum_3m"] is not None else np.nan
+                                     for r in self.rows], dtype=float)
+        self.last_price = np.array([r["last_price"] if r["last_price"] is not None else np.nan
+                                    for r in self.rows], dtype=float)
+        self.row_of = {t: i for i, t in enumerate(self.tickers)}
+
+        # Ticker prefixes plus every word of the company name
+        self.trie = PrefixTrie()
+        for i, r in enumerate(self.rows):
+            self.trie.add(r["ticker"].lower(), i)
+            for word in r["name"].lower().replace(".", " ").replace(",", " ").split():
+                self.trie.add(word, i)
+        self.trie.freeze()
+
+    def search(self, query="", sector=None, sort="momentum", page=1, per_page=12, exclude=(), scores=None):
+        """
+        Filter, sort and paginate. Returns (rows for the page, total matches).
+        `scores` (one per row, higher first) drives the "recommended" sort.
+        """
+        mask = np.ones(len(self.rows), dtype=bool)
+        for term in (query or "").lower().split():
+            hits = np.zeros(len(self.rows), dtype=bool)
+            hits[self.trie.lookup(term)] = True
+            mask &= hits
+        if sector and sector in self.sectors:
+            mask &= self.sector_codes == self.sectors.index(sector)
+        for t in exclude:
+            i = self.row_of.get(t)
+            if i is not None:
+                mask[i] = False
+
+        ids = np.flatnonzero(mask)
+        if sort == "recommended" and scores is not None:
+            ids = ids[np.argsort(-scores[ids], kind="stable")]
+        elif sort == "ticker":
+            ids = ids[np.argsort(self.tickers[ids], kind="stable")]
+        elif sort == "name":
+            ids = ids[np.argsort(self.names[ids], kind="stable")]
+        else:
+            column = self.momentum_3m if sort == "momentum_3m" else self.momentum_1m
+            # Descending, missing metrics last
+            ids = ids[np.argsort(np.nan_to_num(-column[ids], nan=np.inf), kind="stable")]
+
+        start = (max(page, 1) - 1) * per_page
+        return [self.rows[i] for i in ids[start:start + per_page]], len(ids)
+
+
+_index = None
+_index_state = (None, 0.0)   # (table signature, last check time)
+_index_lock = Lock()
+
+
+def _listed():
+    """Rows with reference data; placeholders added by trades (name = ticker, never filled in) are left out."""
+    return db.or_(Security.metadata_updated_at.isnot(None), Security.name != Security.ticker)
+
+
+def get_screener_index():
+    """
+    Shared index, rebuilt only when rows are added or their reference data or
+    screener metrics change. Price marks don't bump screener_updated_at, so
+    intraday polls never force a rebuild.
+    """
+    global _index, _index_state
+    signature, checked = _index_state
+    if _index is not None and time.monotonic() - checked < INDEX_TTL:
+        return _index
+
+    with _index_lock:
+        current = (db.session.query(func.count(Security.ticker), func.max(Security.screener_updated_at))
+                   .filter(_listed()).one())
+        current = (current[0], current[1])
+        if _index is None or current != signature:
+            _index = ScreenerIndex(Security.query.filter(_listed()).all(), version=current)
+        _index_state = (current, time.monotonic())
+    return _index
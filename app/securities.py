@@ -0,0 +1,83 @@
+# app/securities.py
+from app import db
+from app.models import Security, Holding
+from app.profiling import track_upstream
+from app.upserts import insert_ignore
+from datetime import datetime, timedelta
+from sqlalchemy import func
+import yfinance as yf
+
+METADATA_MAX_AGE = timedelta(days=30)   # reference data is re-fetched after this
+
+
+# ---------------- Master Maintenance ----------------
+def ensure_securities(tickers):
+    """
+    Add placeholder master rows for tickers we have never seen (caller commits).
+    The incremental refresh fills in their name and sector later. Rows another
+    request inserts concurrently are skipped rather than failing.
+    """
+    tickers = {t.upper() for t in tickers if t}
+    if not tickers:
+        return 0
+    known = {t for (t,) in db.session.query(Security.ticker).filter(Security.ticker.in_(list(tickers)))}
+    missing = sorted(tickers - known)
+    insert_ignore(Security, [{"ticker": t, "name": t} for t in missing], keys=["ticker"])
+    return len(missing)
+
+
+def refresh_security_metadata(limit=200):
+    """
+    Incremental refresh: fetch reference data for the `limit` securities that
+    have never been filled in or are the most out of date. Returns rows updated.
+    """
+    stale_before = datetime.utcnow() - METADATA_MAX_AGE
+    pending = (Security.query
+               .filter(db.or_(Security.metadata_updated_at.is_(None),
+                              Security.metadata_updated_at < stale_before))
+               .order_by(Security.metadata_updated_at.is_(None).desc(), Security.metadata_updated_at)
+               .limit(limit)
+               .all())
+
+    updates = []
+    for s in pending:
+        try:
+            with track_upstream("yfinance.info", s.ticker):
+                info = yf.Ticker(s.ticker).info or {}
+        except Exception as e:
+            print(f"Error fetching metadata for {s.ticker}: {e}")
+            continue
+        updates.append({
+            "ticker": s.ticker,
+            "name": (info.get("longName") or info.get("shortName") or s.name)[:120],
+            "sector": (info.get("sector") or s.sector or "")[:50] or None,
+            "industry": (info.get("industry") or "")[:100] or None,
+            "description": s.description or info.get("longBusinessSummary"),
+            "metadata_updated_at": datetime.utcnow(),
+            "screener_updated_at": datetime.utcnow(),
+        })
+    db.session.bulk_update_mappings(Security, updates)
+
+    # Sector totals in materialized valuations follow the master
+    from app.valuation import refresh_holders
+    sectors = {s.ticker: s.sector for s in pending}
+    refresh_holders([u["ticker"] for u in updates if u["sector"] != sectors[u["ticker"]]])
+    db.session.commit()
+    return len(updates)
+
+
+# ---------------- Joined Reads ----------------
+def sector_column():
+    """Sector from the master, then the legacy Holding.sector, then 'Unknown'."""
+    return func.coalesce(Security.sector, Holding.sector, "Unknown")
+
+
+def holdings_with_metadata(user_id):
+    """A user's holdings with master name and sector, in a single joined query."""
+    return (db.session.query(Holding,
+                             func.coalesce(Security.name, Holding.ticker).label("name"),
+                             sector_column().label("sector"))
+            .outerjoin(Security, Security.ticker == Holding.ticker)
+            .filter(Holding.user_id == user_id)
+            .order_by(Holding.ticker)
+            .all())
@@ -0,0 +1,86 @@
+# app/sparkline.py
+import numpy as np
+
+UP_COLOR = "green"
+DOWN_COLOR = "red"
+
+
+def simplify(points, epsilon):
+    """
+    Ramer–Douglas–Peucker on an (n x 2) array of points.
+    Iterative (no recursion) and returns a boolean mask of the points to keep.
+    """
+    n = len(points)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        inner = points[start + 1:end]
+        a, b = points[start], points[end]
+        dx, dy = b - a
+        length = np.hypot(dx, dy)
+        if length == 0:
+            dist = np.hypot(*(inner - a).T)
+        else:
+            # Perpendicular distance of every inner point to the chord a-b
+            dist = np.abs(dx * (inner[:, 1] - a[1]) - dy * (inner[:, 0] - a[0])) / length
+        i = int(np.argmax(dist))
+        if dist[i] > epsilon:
+            mid = start + 1 + i
+            keep[mid] = True
+            stack.append((start, mid))
+            stack.append((mid, end))
+    return keep
+
+
+def _column_extremes(x, y):
+    """
+    Indices of the lowest and highest point in every pixel column (plus the
+    endpoints), so long series are cut down to ~2 points per pixel before RDP.
+    """
+    cols = x.astype(np.int64)
+    order = np.lexsort((y, cols))
+    sorted_cols = cols[order]
+    first = np.r_[True, sorted_cols[1:] != sorted_cols[:-1]]
+    last = np.r_[sorted_cols[1:] != sorted_cols[:-1], True]
+    idx = np.concatenate([order[first], order[last], [0, len(x) - 1]])
+    return np.unique(idx)
+
+
+def render_sparkline(prices, width=300, height=150, padding=4, epsilon=0.75, stroke_width=2):
+    """
+    Render a price series as a compact inline SVG polyline.
+    Green when the last price is at or above the first, red otherwise.
+    Pure function of its inputs, so it is safe to call from any thread.
+    """
+    y = np.asarray(prices, dtype=float).ravel()
+    y = y[np.isfinite(y)]
+    if len(y) < 2:
+        return None
+
+    # Scale into the drawing box (SVG y grows downwards)
+    x = np.linspace(padding, width - padding, len(y))
+    low, high = y.min(), y.max()
+    span = high - low
+    if span > 0:
+        py = padding + (high - y) * (height - 2 * padding) / span
+    else:
+        py = np.full(len(y), height / 2)
+    points = np.column_stack([x, py])
+    if len(points) > width:
+        points = points[_column_extremes(x, py)]
+    points = points[simplify(points, epsilon)]
+
+    color = UP_COLOR if y[-1] >= y[0] else DOWN_COLOR
+    path = "M" + " L".join(f"{px:.1f},{pyy:.1f}" for px, pyy in points)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" '
+        f'width="{width}" height="{height}" preserveAspectRatio="none">'
+        f'<path d="{path}" fill="none" stroke="{color}" stroke-width="{stroke_width}" '
+        f'stroke-linejoin="round" stroke-linecap="round"/></svg>'
+    )
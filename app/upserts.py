@@ -0,0 +1,54 @@
+# app/upserts.py
+from app import db
+from sqlalchemy import func
+
+# Dialect-native "insert unless the key exists" / "insert or merge", so
+# concurrent writers of the same key never fail on a unique constraint.
+# MySQL is the production database; SQLite and PostgreSQL share ON CONFLICT.
+
+
+def _insert(model):
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"No upsert support for {dialect}")
+    return dialect, insert(model.__table__)
+
+
+def insert_ignore(model, rows, keys):
+    """Insert `rows` (dicts), silently skipping any whose `keys` already exist."""
+    if not rows:
+        return
+    dialect, stmt = _insert(model)
+    if dialect == "mysql":
+        stmt = stmt.prefix_with("IGNORE")
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=keys)
+    db.session.execute(stmt, rows)
+
+
+def upsert(model, rows, keys, replace=(), low=(), high=()):
+    """
+    Insert `rows`; where `keys` already exist, overwrite the `replace`
+    columns and keep the smaller of the `low` and larger of the `high` ones.
+    """
+    if not rows:
+        return
+    dialect, stmt = _insert(model)
+    table = model.__table__
+    new = stmt.inserted if dialect == "mysql" else stmt.excluded
+    least, greatest = (func.min, func.max) if dialect == "sqlite" else (func.least, func.greatest)
+
+    update = {c: new[c] for c in replace}
+    update.update({c: least(table.c[c], new[c]) for c in low})
+    update.update({c: greatest(table.c[c], new[c]) for c in high})
+    if dialect == "mysql":
+        stmt = stmt.on_duplicate_key_update(**update)
+    else:
+        stmt = stmt.on_conflict_do_update(index_elements=keys, set_=update)
+    db.session.execute(stmt, rows)
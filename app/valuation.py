@@ -0,0 +1,183 @@
+# app/valuation.py
+from app import db
+from app.models import Holding, Portfolio, Security, PortfolioValuation
+from app.securities import sector_column
+from decimal import Decimal
+from sqlalchemy import func
+
+ZERO = Decimal("0.00")
+CENT = Decimal("0.01")
+
+
+def _money(value):
+    return Decimal(str(value or 0)).quantize(CENT)
+
+
+def _mark():
+    """Price a position is valued at: the master's last price, else what was paid."""
+    return func.coalesce(Security.last_price, Holding.purchase_price)
+
+
+def _set_totals(valuation, market_value, sectors, portfolio):
+    valuation.market_value = _money(market_value)
+    valuation.sector_values = {s: str(_money(v)) for s, v in sorted(sectors.items()) if _money(v) != ZERO}
+    if portfolio is not None:
+        valuation.cash_balance = _money(portfolio.cash_balance)
+        valuation.invested = _money(portfolio.total_invested)
+    valuation.total_value = valuation.market_value + _money(valuation.cash_balance)
+
+
+# ---------------- Full Rebuilds ----------------
+def refresh_valuations(user_ids):
+    """
+    Recompute the given users' valuations from their holdings in one grouped
+    query (caller commits). Used after bulk position changes and for repair.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return {}
+    sector = sector_column()
+    rows = (db.session.query(Holding.user_id, sector, func.sum(Holding.quantity * _mark()))
+            .outerjoin(Security, Security.ticker == Holding.ticker)
+            .filter(Holding.user_id.in_(user_ids))
+            .group_by(Holding.user_id, sector))
+    sectors = {u: {} for u in user_ids}
+    for user_id, sector_name, value in rows:
+        sectors[user_id][sector_name] = _money(value)
+
+    portfolios = {p.user_id: p for p in Portfolio.query.filter(Portfolio.user_id.in_(user_ids))}
+    existing = {v.user_id: v for v in
+                PortfolioValuation.query.filter(PortfolioValuation.user_id.in_(user_ids)).with_for_update()}
+    for user_id in user_ids:
+        valuation = existing.get(user_id)
+        if valuation is None:
+            valuation = existing[user_id] = PortfolioValuation(user_id=user_id, cash_balance=ZERO)
+            db.session.add(valuation)
+        _set_totals(valuation, sum(sectors[user_id].values(), ZERO), sectors[user_id],
+                    portfolios.get(user_id))
+    return existing
+
+
+def refresh_holders(tickers):
+    """Rebuild valuations of everyone holding `tickers`, e.g. after a sector change (caller commits)."""
+    tickers = [t.upper() for t in tickers]
+    if not tickers:
+        return 0
+    user_ids = [u for (u,) in db.session.query(Holding.user_id).filter(Holding.ticker.in_(tickers)).distinct()]
+    refresh_valuations(user_ids)
+    return len(user_ids)
+
+
+def rebuild_all_valuations(batch_size=1000):
+    """Recompute every user's valuation; returns the number of users written."""
+    from app.models import User
+    user_ids = [u for (u,) in db.session.query(User.id).order_by(User.id)]
+    for start in range(0, len(user_ids), batch_size):
+        refresh_valuations(user_ids[start:start + batch_size])
+        db.session.commit()
+    return len(user_ids)
+
+
+# ---------------- Incremental Updates ----------------
+def mark_prices(prices):
+    """
+    Apply a price tick {ticker: price} (caller commits).
+    Only holders of tickers whose price moved are touched: the
+    (ticker, user_id) index finds them, and each valuation changes by
+    quantity x (new price - old mark). Returns the set of affected user ids.
+    """
+    prices = {t.upper(): _money(p) for t, p in prices.items() if p is not None}
+    if not prices:
+        return set()
+    # Lock order: securities, then valuations
+    marks = {s.ticker: s for s in
+             Security.query.filter(Security.ticker.in_(list(prices))).with_for_update()}
+    moved = [t for t, p in prices.items() if t not in marks or marks[t].last_price != p]
+    if not moved:
+        return set()
+
+    sector = sector_column()
+    rows = (db.session.query(Holding.user_id, Holding.ticker, Holding.quantity,
+                             Holding.purchase_price, sector)
+            .outerjoin(Security, Security.ticker == Holding.ticker)
+            .filter(Holding.ticker.in_(moved)))
+    deltas = {}
+    for user_id, ticker, quantity, purchase_price, sector_name in rows:
+        security = marks.get(ticker.upper())
+        old = security.last_price if security is not None and security.last_price is not None else purchase_price
+        change = quantity * (prices[ticker.upper()] - _money(old))
+        by_sector = deltas.setdefault(user_id, {})
+        by_sector[sector_name] = by_sector.get(sector_name, ZERO) + change
+
+    for t in moved:
+        if t in marks:
+            marks[t].last_price = prices[t]
+        else:
+            db.session.add(Security(ticker=t, name=t, last_price=prices[t]))
+
+    if deltas:
+        valuations = {v.user_id: v for v in PortfolioValuation.query.filter(
+            PortfolioValuation.user_id.in_(list(deltas))).with_for_update()}
+        missing = [u for u in deltas if u not in valuations]
+        # Cash can change outside the trade paths, so resync it whenever a row is marked
+        portfolios = {p.user_id: p for p in Portfolio.query.filter(Portfolio.user_id.in_(list(deltas)))}
+        for user_id, by_sector in deltas.items():
+            valuation = valuations.get(user_id)
+            if valuation is None:
+                continue
+            sectors = {s: Decimal(v) for s, v in (valuation.sector_values or {}).items()}
+            for s, change in by_sector.items():
+                sectors[s] = sectors.get(s, ZERO) + change
+            _set_totals(valuation, valuation.market_value + sum(by_sector.values(), ZERO), sectors,
+                        portfolios.get(user_id))
+        if missing:
+            # First sighting of these users: build them in full at the new marks
+            db.session.flush()
+            refresh_valuations(missing)
+    return set(deltas)
+
+
+def apply_position_change(user_id, ticker, quantity_delta, price, portfolio):
+    """
+    Fold one trade into the user's valuation (caller commits). Call it after
+    mark_prices({ticker: price}) and the cash update but before changing the
+    Holding, so existing shares are re-marked and the traded shares are
+    valued at the same price.
+    """
+    valuation = PortfolioValuation.query.filter_by(user_id=user_id).with_for_update().first()
+    if valuation is None:
+        valuation = refresh_valuations([user_id])[user_id]
+    sector_name = (db.session.query(sector_column())
+                   .select_from(Holding)
+                   .outerjoin(Security, Security.ticker == Holding.ticker)
+                   .filter(Holding.user_id == user_id, Holding.ticker == ticker)
+                   .limit(1)
+                   .scalar())
+    if sector_name is None:
+        security = db.session.get(Security, ticker)
+        sector_name = (security.sector if security is not None else None) or "Unknown"
+
+    change = quantity_delta * _money(price)
+    sectors = {s: Decimal(v) for s, v in (valuation.sector_values or {}).items()}
+    sectors[sector_name] = sectors.get(sector_name, ZERO) + change
+    _set_totals(valuation, valuation.market_value + change, sectors, portfolio)
+
+
+# ---------------- Reads ----------------
+def live_total(valuation, portfolio):
+    """
+    Stored market value plus the portfolio's current cash. Cash is read live
+    because deposits and admin edits don't go through the valuation paths.
+    """
+    cash = portfolio.cash_balance if portfolio is not None else ZERO
+    return _money(valuation.market_value) + _money(cash)
+
+
+def get_valuation(user_id):
+    """The user's materialized valuation (a primary-key read), built on first use."""
+    valuation = db.session.get(PortfolioValuation, user_id)
+    if valuation is None:
+        valuation = refresh_valuations([user_id])[user_id]
+        db.session.commit()
+    return valuation
+
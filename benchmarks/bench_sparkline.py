@@ -0,0 +1,83 @@
+# benchmarks/bench_sparkline.py
+"""
+Compare the SVG sparkline renderer with the previous matplotlib PNG path.
+
+    python benchmarks/bench_sparkline.py [--points 7] [--charts 200] [--threads 8]
+
+matplotlib is only needed to run this script, not by the app.
+"""
+import argparse
+import base64
+import os
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.sparkline import render_sparkline  # noqa: E402
+
+
+def render_matplotlib(closes):
+    """The pre-sparkline implementation from routes/stocks.py."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(3, 1.5))
+    plt.plot(closes, color="green" if closes[-1] >= closes[0] else "red")
+    plt.xticks([], [])
+    plt.yticks([], [])
+    plt.tight_layout()
+    buf = BytesIO()
+    plt.savefig(buf, format="png", transparent=True)
+    buf.seek(0)
+    img = base64.b64encode(buf.read()).decode("utf-8")
+    plt.close()
+    return img
+
+
+def run(fn, series, threads):
+    if threads == 1:
+        return [fn(s) for s in series]
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(fn, series))
+
+
+def measure(name, fn, series, threads=1):
+    # Time first, then a separate pass for memory (tracemalloc skews timings)
+    start = time.perf_counter()
+    out = run(fn, series, threads)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    run(fn, series[:20], threads)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = sum(len(o) for o in out) / len(out)
+    print(f"{name:<28} {elapsed * 1000 / len(series):8.3f} ms/chart "
+          f"{peak / 1024:10.1f} KiB peak {size:9.0f} bytes/chart")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--points", type=int, default=7, help="closes per series")
+    parser.add_argument("--charts", type=int, default=200, help="charts to render")
+    parser.add_argument("--threads", type=int, default=8, help="threads for the concurrent run")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    series = [100 * np.exp(np.cumsum(rng.normal(0, 0.02, args.points))) for _ in range(args.charts)]
+
+    render_matplotlib(series[0])  # warm up imports and font cache
+    measure("matplotlib (1 thread)", render_matplotlib, series)
+    measure("svg sparkline (1 thread)", render_sparkline, series)
+    # matplotlib's pyplot state machine is not thread-safe, so only the SVG path runs concurrently
+    measure(f"svg sparkline ({args.threads} threads)", render_sparkline, series, threads=args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,16 @@
 # run.py
 from app import create_app, db
+from app.schema import create_missing_indexes
+from app.screener import seed_universe
+from app.routes.stocks import TOP_STOCKS
 
 app = create_app()
 
-# Create tables if they don’t exist
+# Create tables and indexes if they don’t exist and seed the screener universe
 with app.app_context():
     db.create_all()
+    create_missing_indexes()
+    seed_universe(TOP_STOCKS)
 
 if __name__ == "__main__":
     app.run(debug=True)